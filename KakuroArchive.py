@@ -0,0 +1,245 @@
+"""Compact binary archive of many Kakuro puzzles, read with random access.
+
+An archive is made of:
+ - a header: the magic b"KKRA", the version, the number of puzzles and the
+   offset of the index;
+ - the records of the puzzles, one after the other: the number of rows and
+   of columns (one byte each) and then every cell in reading order as a
+   fixed-width little-endian 16 bit word. A blank is 0x8000 plus its given
+   value (0 if none), a brick is its vertical sum plus 64 times its
+   horizontal sum (0 if none);
+ - the index: the offset of every record, as 64 bit words.
+
+The reader maps the file in memory and decodes a puzzle straight into the
+blanks and the sums of a KakuroBoard, without building a grid of Brick and
+Blank objects or parsing any text.
+
+    python KakuroArchive.py puzzles.kka puzzles/ more/*.txt corpus.jsonl
+"""
+
+import argparse
+import mmap
+import struct
+import sys
+
+from KakuroSolver import KakuroBoard
+from utils.KakuroTiles import Brick, Blank
+
+MAGIC = b"KKRA"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHIQ")
+_SIZE = struct.Struct("<BB")
+_OFFSET = struct.Struct("<Q")
+
+BLANK = 0x8000
+
+
+def encodeTile(tile):
+    """Return the word of a tile of the grid."""
+    if isinstance(tile, Blank):
+        return BLANK | (tile.possibleValues[0] if len(tile.possibleValues) == 1 else 0)
+    return (tile.verticalSum or 0) | (tile.horizontalSum or 0) << 6
+
+def decodeTile(word):
+    """Return the Brick or Blank of a word, the inverse of encodeTile."""
+    if word & BLANK:
+        return Blank(word & 0xF or None)
+    return Brick(v = word & 0x3F or None, h = word >> 6 or None)
+
+
+class ArchiveWriter:
+    """Write an archive, adding the puzzles one at a time:
+
+        with ArchiveWriter("puzzles.kka") as writer:
+            writer.addText(text)
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, "wb")
+        self._offsets = []
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def add(self, board):
+        """Add a puzzle given as rows of Brick and Blank."""
+
+        rows, cols = len(board), max((len(row) for row in board), default = 0)
+        if rows > 255 or cols > 255:
+            raise ValueError("Board too big for the archive: %dx%d" % (rows, cols))
+        words = []
+        for row in board:
+            words.extend(encodeTile(tile) for tile in row)
+            # Short rows are padded with bricks.
+            words.extend([0] * (cols - len(row)))
+
+        self._offsets.append(self._file.tell())
+        self._file.write(_SIZE.pack(rows, cols))
+        self._file.write(struct.pack("<%dH" % len(words), *words))
+
+    def addText(self, text):
+        """Add a puzzle given as the content of a CSV file (see
+        KakuroBoard._parse)."""
+        self.add(KakuroBoard._parseText(text))
+
+    def close(self):
+        if self._file.closed:
+            return
+        indexOffset = self._file.tell()
+        for offset in self._offsets:
+            self._file.write(_OFFSET.pack(offset))
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(self._offsets), indexOffset))
+        self._file.close()
+
+def writeArchive(filename, texts):
+    """Write an archive with the puzzles given as the contents of CSV files,
+    return the number of puzzles."""
+
+    with ArchiveWriter(filename) as writer:
+        for text in texts:
+            writer.addText(text)
+        return len(writer)
+
+
+class KakuroArchive:
+    """Read an archive, mapped in memory. archive[n] is the n-th puzzle as a
+    KakuroBoard, iterating over the archive yields all of them in order."""
+
+    def __init__(self, filename, backend = KakuroBoard.PYTHON):
+        self.filename = filename
+        self.backend = backend
+        with open(filename, "rb") as archive_file:
+            self._map = mmap.mmap(archive_file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        magic, version, count, indexOffset = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a puzzle archive: %s" % filename)
+        if version != VERSION:
+            raise ValueError("Unsupported archive version: %d" % version)
+        self._count = count
+        self._indexOffset = indexOffset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, n):
+        return self.board(n)
+
+    def __iter__(self):
+        for n in range(self._count):
+            yield self.board(n)
+
+    def cells(self, n):
+        """Return the number of rows and of columns of the n-th puzzle and the
+        words of its cells, as a tuple.
+
+        The words are decoded as little-endian whatever the byte order of
+        the machine, and copied, so they do not keep the map open."""
+
+        if not 0 <= n < self._count:
+            raise IndexError("Puzzle %d not in the archive" % n)
+        offset, = _OFFSET.unpack_from(self._map, self._indexOffset + _OFFSET.size * n)
+        rows, cols = _SIZE.unpack_from(self._map, offset)
+        return rows, cols, struct.unpack_from("<%dH" % (rows * cols), self._map,
+                                              offset + _SIZE.size)
+
+    def board(self, n):
+        """Return the n-th puzzle as a KakuroBoard without a grid (see
+        KakuroBoard.fromSums), numbered and with the sums in the same order
+        as if it was read from its CSV file."""
+
+        rows, cols, words = self.cells(n)
+        backend = self.backend
+
+        # The id of the blank of every cell, -1 for bricks.
+        ids = [-1] * len(words)
+        tiles = []
+        for i, word in enumerate(words):
+            if word & BLANK:
+                ids[i] = len(tiles)
+                given = word & 0xF
+                tiles.append(Blank(given or None, specificId = len(tiles)))
+
+        sums = []
+        for i, word in enumerate(words):
+            if word & BLANK or not word:
+                continue
+            vertical, horizontal = word & 0x3F, word >> 6
+            if vertical:
+                blocks = []
+                j = i + cols
+                while j < len(words) and ids[j] >= 0:
+                    blocks.append(tiles[ids[j]])
+                    j += cols
+                sums.append(KakuroBoard._createSum(vertical, blocks, backend))
+            if horizontal:
+                blocks = []
+                j = i + 1
+                while j % cols and ids[j] >= 0:
+                    blocks.append(tiles[ids[j]])
+                    j += 1
+                sums.append(KakuroBoard._createSum(horizontal, blocks, backend))
+
+        return KakuroBoard.fromSums(tiles, [sum for sum in sums if sum is not None])
+
+    def grid(self, n):
+        """Return the n-th puzzle as rows of Brick and Blank, the blanks
+        numbered like the tiles of board(n)."""
+
+        rows, cols, words = self.cells(n)
+        grid = [[decodeTile(word) for word in words[x * cols:(x + 1) * cols]] for x in range(rows)]
+        tileID = 0
+        for row in grid:
+            for tile in row:
+                if isinstance(tile, Blank):
+                    tile._id = tileID
+                    tileID += 1
+        return grid
+
+    def text(self, n):
+        """Return the n-th puzzle as the content of a CSV file."""
+        return KakuroBoard._toText(self.grid(n))
+
+    def toGrid(self, n, tiles):
+        """Return the rows of the n-th puzzle with the values of the solved
+        tiles of its board, null for bricks, like KakuroBatch.toGrid."""
+
+        rows, cols, words = self.cells(n)
+        values = iter(tiles)
+        return [[next(values).possibleValues[0] if word & BLANK else None
+                 for word in words[x * cols:(x + 1) * cols]] for x in range(rows)]
+
+
+def main(argv = None):
+    from KakuroBatch import readPuzzles
+
+    parser = argparse.ArgumentParser(description = "Convert Kakuro puzzles to a binary archive.")
+    parser.add_argument("archive", help = "archive to write")
+    parser.add_argument("sources", nargs = "+",
+                        help = "puzzle files, directories, glob patterns or JSONL files")
+    args = parser.parse_args(argv)
+
+    count = writeArchive(args.archive, (text for _, text in readPuzzles(args.sources)))
+    print("%d puzzles written to %s" % (count, args.archive), file = sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Solve many Kakuro puzzles in bulk.
+
+The puzzles are in the CSV format read by KakuroBoard._parse and can be given
+as files, directories (every file in them), glob patterns or JSONL files with
+one puzzle per line, as {"id": ..., "puzzle": "<CSV content>"}, or binary
+archives (.kka, see KakuroArchive), whose puzzles the workers read straight
+from the archive. They are spread in chunks over a pool of processes and the
+results are written, as soon as every chunk is done, one JSON line per
+puzzle:
+
+    {"id": ..., "solutions": [grid, ...], "time": seconds}
+
+where grid is the list of the rows of the board, with null for bricks and the
+value for blanks. A puzzle that cannot be read or solved has an "error" field
+instead of the solutions.
+
+With --cache the solutions are looked up first, and stored after solving, in
+a sqlite SolutionCache shared by the workers, so that puzzles already solved,
+also in another run or transposed, are answered without any search.
+
+    python KakuroBatch.py puzzles/ more/*.txt corpus.jsonl -o solutions.jsonl
+    python KakuroBatch.py corpus.kka -o solutions.jsonl
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import sys
+import time
+
+from KakuroSolver import KakuroBoard
+from KakuroArchive import KakuroArchive
+from utils.KakuroTiles import Blank
+from utils.SolutionCache import SolutionCache
+
+# The archives and caches opened by the process, by path (and backend).
+_archives = {}
+_caches = {}
+
+
+def readPuzzles(sources):
+    """Yield (id, CSV content) for every puzzle in the sources, lazily. For
+    the puzzles in an archive the CSV content is replaced by (path of the
+    archive, number of the puzzle)."""
+
+    for source in sources:
+        if os.path.isdir(source):
+            paths = sorted(os.path.join(source, name) for name in os.listdir(source))
+            paths = [path for path in paths if os.path.isfile(path)]
+        elif glob.has_magic(source):
+            paths = sorted(glob.glob(source))
+        else:
+            paths = [source]
+
+        for path in paths:
+            if path.endswith(".kka"):
+                with KakuroArchive(path) as archive:
+                    count = len(archive)
+                for n in range(count):
+                    yield "%s#%d" % (path, n), (path, n)
+            elif path.endswith(".jsonl"):
+                with open(path, encoding="utf8") as jsonl_file:
+                    for n, line in enumerate(jsonl_file):
+                        if line.strip():
+                            record = json.loads(line)
+                            yield record.get("id", "%s:%d" % (path, n + 1)), record["puzzle"]
+            else:
+                with open(path, encoding="utf8") as csv_file:
+                    yield path, csv_file.read()
+
+def toGrid(board, tiles):
+    """Return the rows of the board with the values of the solved tiles,
+    which are in reading order."""
+    values = iter(tiles)
+    return [[next(values).possibleValues[0] if isinstance(tile, Blank) else None
+             for tile in row] for row in board]
+
+def solvePuzzle(puzzleId, text, maxSolutions = None, mode = KakuroBoard.TRAIL,
+                backend = KakuroBoard.PYTHON, cachePath = None):
+    """Solve a single puzzle, given as CSV content or (path of the archive,
+    number of the puzzle), and return its result record. If cachePath is
+    given, the SolutionCache stored there is used."""
+
+    start = time.perf_counter()
+    try:
+        cache = None
+        if cachePath is not None:
+            cache = _caches.get(cachePath)
+            if cache is None:
+                cache = _caches[cachePath] = SolutionCache(cachePath)
+
+        if isinstance(text, tuple):
+            path, n = text
+            archive = _archives.get((path, backend))
+            if archive is None:
+                archive = _archives[(path, backend)] = KakuroArchive(path, backend)
+            # The fingerprint needs the grid, the search does not.
+            rows = archive.grid(n) if cache is not None else None
+            makeBoard = lambda: archive.board(n)
+            grid = lambda tiles: archive.toGrid(n, tiles)
+        else:
+            rows = KakuroBoard._parseText(text)
+            makeBoard = lambda: KakuroBoard(rows, backend = backend)
+            grid = lambda tiles: toGrid(rows, tiles)
+
+        # The board is only built if the cache does not have enough
+        # solutions, even if not all of them.
+        found = None if cache is None else cache.solutions(rows, maxSolutions)
+        if found is None:
+            board = makeBoard()
+            board.board = rows
+            found = board.solve(mode, cache = cache)
+        solutions = []
+        for tiles in found:
+            solutions.append(grid(tiles))
+            if maxSolutions is not None and len(solutions) >= maxSolutions:
+                break
+        if cache is not None and hasattr(found, "close"):
+            # Store the solutions found now rather than when collected.
+            found.close()
+        record = {"id": puzzleId, "solutions": solutions}
+    except Exception as e:
+        record = {"id": puzzleId, "error": "%s: %s" % (type(e).__name__, e)}
+    record["time"] = time.perf_counter() - start
+    return record
+
+def _solveChunk(chunk, *options):
+    """Worker side: solve a chunk of puzzles from readPuzzles."""
+    return [solvePuzzle(puzzleId, text, *options) for puzzleId, text in chunk]
+
+def _chunks(puzzles, size):
+    chunk = []
+    for puzzle in puzzles:
+        chunk.append(puzzle)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def solveBatch(puzzles, workers = None, chunkSize = 8, maxSolutions = None,
+               mode = KakuroBoard.TRAIL, backend = KakuroBoard.PYTHON, cachePath = None):
+    """Solve the puzzles from readPuzzles over a pool of processes, yielding
+    the result records as soon as their chunk is done, so not in order.
+
+    Only a bounded number of chunks is submitted at a time, so the puzzles can
+    be a lazy iterator over a corpus of any size."""
+
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+        chunks = _chunks(puzzles, chunkSize)
+        maxPending = 2 * workers
+        pending = set()
+        while True:
+            for chunk in chunks:
+                pending.add(executor.submit(_solveChunk, chunk, maxSolutions, mode, backend,
+                                             cachePath))
+                if len(pending) >= maxPending:
+                    break
+
+            if not pending:
+                return
+
+            done, pending = concurrent.futures.wait(pending, return_when = concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                for record in future.result():
+                    yield record
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Solve Kakuro puzzles in bulk.")
+    parser.add_argument("sources", nargs = "+",
+                        help = "puzzle files, directories, glob patterns, JSONL files or archives")
+    parser.add_argument("-o", "--output", default = "-",
+                        help = "JSONL file for the results (default: stdout)")
+    parser.add_argument("-w", "--workers", type = int, default = None,
+                        help = "number of worker processes (default: number of CPUs)")
+    parser.add_argument("-c", "--chunk-size", type = int, default = 8,
+                        help = "number of puzzles sent to a worker at a time")
+    parser.add_argument("-n", "--max-solutions", type = int, default = None,
+                        help = "stop each puzzle after this many solutions")
+    parser.add_argument("--mode", choices = [KakuroBoard.TRAIL, KakuroBoard.COPY],
+                        default = KakuroBoard.TRAIL, help = "search mode")
+    parser.add_argument("--backend", choices = [KakuroBoard.PYTHON, KakuroBoard.NUMPY,
+                        KakuroBoard.COMPACT], default = KakuroBoard.PYTHON,
+                        help = "backend of the sums")
+    parser.add_argument("--cache", default = None,
+                        help = "sqlite file of the solution cache")
+    args = parser.parse_args(argv)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf8")
+    try:
+        results = solveBatch(readPuzzles(args.sources), args.workers, args.chunk_size,
+                             args.max_solutions, args.mode, args.backend, args.cache)
+        for record in results:
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
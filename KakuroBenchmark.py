@@ -0,0 +1,190 @@
+"""Benchmarks of the solver, to check a change before rolling it out.
+
+The benchmarks are the fixed boards in examples/ plus puzzles built by
+KakuroGenerator for some sizes and seeds. For each of them the construction
+of KakuroBoard and solve() are timed (best of some runs), the work of the
+search is counted with Stats and the peak memory of both is measured with
+tracemalloc in a separate run. The results can be saved as JSON and compared
+with the ones of a previous run, which also gives the puzzles to use, so that
+the same puzzles are measured:
+
+    python KakuroBenchmark.py -o before.json
+    ... change the solver ...
+    python KakuroBenchmark.py -o after.json --compare before.json
+
+The same way the branching strategies can be compared with each other:
+
+    python KakuroBenchmark.py -o mrv.json
+    python KakuroBenchmark.py --strategy domwdeg --compare mrv.json
+
+and the backends of the sums, for the peak memory on big boards:
+
+    python KakuroBenchmark.py --sizes 40,60 --seeds 1 -n 1 -o python.json
+    python KakuroBenchmark.py --backend compact --compare python.json
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from KakuroSolver import KakuroBoard
+from KakuroGenerator import generateText
+from utils.Stats import Stats
+from utils.Heuristics import STRATEGIES
+
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples")
+
+
+def fixedPuzzles():
+    """Return the (name, CSV content) of the boards in examples/."""
+    puzzles = []
+    for path in sorted(glob.glob(os.path.join(EXAMPLES, "*.txt"))):
+        with open(path, encoding="utf8") as csv_file:
+            puzzles.append((os.path.basename(path), csv_file.read()))
+    return puzzles
+
+def generatedPuzzles(sizes, density, seeds):
+    """Return the (name, CSV content) of the generated puzzles."""
+    return [("gen-%dx%d-d%g-s%d" % (size, size, density, seed), generateText(size, density, seed))
+            for size in sizes for seed in seeds]
+
+def _solve(text, maxSolutions, backend, options):
+    board = KakuroBoard.fromText(text, backend = backend)
+    built = time.perf_counter()
+    stats = Stats()
+    solutions = 0
+    for tiles in board.solve(stats = stats, **options):
+        solutions += 1
+        if maxSolutions is not None and solutions >= maxSolutions:
+            break
+    return built, solutions, stats
+
+def runBenchmark(name, text, repeat = 3, maxSolutions = None, backend = KakuroBoard.PYTHON,
+                 **options):
+    """Run a benchmark and return its result record. The options are given
+    to solve()."""
+
+    buildTime = solveTime = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        built, solutions, stats = _solve(text, maxSolutions, backend, options)
+        end = time.perf_counter()
+        buildTime = min(buildTime, built - start)
+        solveTime = min(solveTime, end - built)
+
+    # The memory is measured apart, since tracing slows everything down.
+    tracemalloc.start()
+    try:
+        board = KakuroBoard.fromText(text, backend = backend)
+        buildPeak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        solutionCount = 0
+        for tiles in board.solve(**options):
+            solutionCount += 1
+            if maxSolutions is not None and solutionCount >= maxSolutions:
+                break
+        solvePeak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    record = {"name": name, "puzzle": text,
+              "buildTime": buildTime, "solveTime": solveTime,
+              "buildPeakMemory": buildPeak, "solvePeakMemory": solvePeak,
+              "solutions": solutions}
+    record.update(stats.asDict())
+    return record
+
+def compare(old, new, tolerance = 0.2, minTime = 0.001):
+    """Print the comparison of two runs and return the names of the
+    benchmarks that got worse: slower by more than the tolerance (and by at
+    least minTime seconds), more search nodes, or a different number of
+    solutions."""
+
+    oldResults = {record["name"]: record for record in old["results"]}
+    regressions = []
+    print("%-28s %12s %12s %8s %10s %10s" % ("benchmark", "old solve", "new solve", "ratio",
+                                             "old nodes", "new nodes"))
+    for record in new["results"]:
+        before = oldResults.get(record["name"])
+        if before is None:
+            continue
+        ratio = record["solveTime"] / before["solveTime"] if before["solveTime"] else float("inf")
+        worse = (ratio > 1 + tolerance and record["solveTime"] - before["solveTime"] > minTime) \
+                or record["nodes"] > before["nodes"] or record["solutions"] != before["solutions"]
+        if worse:
+            regressions.append(record["name"])
+        print("%-28s %11.4fs %11.4fs %8.2f %10d %10d%s" % (record["name"], before["solveTime"],
+              record["solveTime"], ratio, before["nodes"], record["nodes"], "  <-- worse" if worse else ""))
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Benchmark the Kakuro solver.")
+    parser.add_argument("-o", "--output", help = "save the results to this JSON file")
+    parser.add_argument("--compare", help = "JSON results of a previous run to compare with, "
+                                            "whose puzzles are used")
+    parser.add_argument("--sizes", default = "6,8,10,12",
+                        help = "comma separated sizes of the generated puzzles")
+    parser.add_argument("--density", type = float, default = 0.75)
+    parser.add_argument("--seeds", type = int, default = 3,
+                        help = "number of generated puzzles for each size")
+    parser.add_argument("--repeat", type = int, default = 3, help = "timed runs of each benchmark")
+    parser.add_argument("-n", "--max-solutions", type = int, default = None)
+    parser.add_argument("--mode", choices = [KakuroBoard.TRAIL, KakuroBoard.COPY],
+                        default = KakuroBoard.TRAIL)
+    parser.add_argument("--backend", choices = [KakuroBoard.PYTHON, KakuroBoard.NUMPY,
+                        KakuroBoard.COMPACT], default = KakuroBoard.PYTHON,
+                        help = "backend of the sums")
+    parser.add_argument("--strategy", choices = sorted(STRATEGIES), default = "mrv",
+                        help = "branching strategy of the search")
+    parser.add_argument("--inference", choices = [KakuroBoard.GAC, KakuroBoard.SAC_ROOT,
+                        KakuroBoard.SAC], default = KakuroBoard.GAC,
+                        help = "inference level of the search")
+    parser.add_argument("--probe-budget", type = int, default = None,
+                        help = "values probed at each node with the SAC levels")
+    parser.add_argument("--tolerance", type = float, default = 0.2,
+                        help = "relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    old = None
+    if args.compare:
+        with open(args.compare, encoding="utf8") as json_file:
+            old = json.load(json_file)
+        puzzles = [(record["name"], record["puzzle"]) for record in old["results"]]
+    else:
+        sizes = [int(size) for size in args.sizes.split(",") if size]
+        puzzles = fixedPuzzles() + generatedPuzzles(sizes, args.density, range(args.seeds))
+
+    results = []
+    for name, text in puzzles:
+        record = runBenchmark(name, text, args.repeat, args.max_solutions, args.backend,
+                              mode = args.mode, strategy = args.strategy, inference = args.inference,
+                              probeBudget = args.probe_budget)
+        results.append(record)
+        print("%-28s build %8.4fs  solve %8.4fs  solutions %4d  revisions %8d  nodes %6d  "
+              "peak %7.1f KiB" % (name, record["buildTime"], record["solveTime"], record["solutions"],
+              record["revisions"], record["nodes"], max(record["buildPeakMemory"],
+              record["solvePeakMemory"]) / 1024), file = sys.stderr)
+
+    run = {"date": datetime.datetime.now().isoformat(), "python": platform.python_version(),
+           "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as json_file:
+            json.dump(run, json_file, indent = 1)
+
+    if old is not None:
+        regressions = compare(old, run, args.tolerance)
+        if regressions:
+            print("%d benchmark(s) got worse" % len(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Seeded generator of random Kakuro puzzles with a unique solution.
+
+A puzzle is generated in three steps:
+ - the layout: every cell inside the first row and column is white with
+   probability density, then white cells that would be alone in a run are
+   turned into bricks and runs longer than 9 are cut in two, until stable;
+ - the solution: the white cells are filled with random digits, never
+   repeated in a run, backtracking when a cell has no digit left;
+ - the clues are the sums of the runs. If the puzzle has more than one
+   solution, a cell where two solutions differ is given its value, until
+   the solution is unique. Then the givens that are not needed for that
+   are dropped.
+
+    python KakuroGenerator.py 10 --density 0.7 --seed 3 > puzzle.txt
+"""
+
+import argparse
+import random
+
+from KakuroSolver import KakuroBoard
+from utils.KakuroTiles import Brick, Blank
+
+
+def _runs(white):
+    """Yield the horizontal and vertical runs of white cells, as lists of
+    (row, column)."""
+
+    size = len(white)
+    for horizontal in (True, False):
+        for i in range(size):
+            run = []
+            for j in range(size + 1):
+                x, y = (i, j) if horizontal else (j, i)
+                if j < size and white[x][y]:
+                    run.append((x, y))
+                else:
+                    if run:
+                        yield run
+                    run = []
+
+def _makeLayout(rng, size, density):
+    white = [[x > 0 and y > 0 and rng.random() < density for y in range(size)]
+             for x in range(size)]
+
+    changed = True
+    while changed:
+        changed = False
+        for run in _runs(white):
+            if len(run) == 1:
+                x, y = run[0]
+                white[x][y] = False
+                changed = True
+            elif len(run) > 9:
+                x, y = run[len(run) // 2]
+                white[x][y] = False
+                changed = True
+    return white
+
+def _fill(rng, white):
+    """Return the grid of the digits of a random solution for the layout, or
+    None if none was found within a budget of steps."""
+
+    size = len(white)
+    cells = [(x, y) for x in range(size) for y in range(size) if white[x][y]]
+    values = [[None] * size for _ in range(size)]
+
+    def used(x, y):
+        digits = set()
+        for dx, dy in ((0, -1), (-1, 0)):
+            i, j = x + dx, y + dy
+            while white[i][j]:
+                digits.add(values[i][j])
+                i, j = i + dx, j + dy
+        return digits
+
+    # Iterative backtracking: candidates[k] are the digits still to try for
+    # the k-th cell.
+    candidates = []
+    steps = 0
+    while len(candidates) < len(cells):
+        steps += 1
+        if steps > 100 * len(cells) + 1000:
+            return None
+
+        k = len(candidates)
+        x, y = cells[k]
+        digits = [d for d in range(1, 10) if d not in used(x, y)]
+        rng.shuffle(digits)
+        candidates.append(digits)
+
+        # Take the next digit, going back while a cell has none left.
+        while candidates and not candidates[-1]:
+            candidates.pop()
+            x, y = cells[len(candidates)]
+            values[x][y] = None
+        if not candidates:
+            return None
+        x, y = cells[len(candidates) - 1]
+        values[x][y] = candidates[-1].pop()
+
+    return values
+
+def _makeBoard(white, values, givens):
+    size = len(white)
+    board = []
+    for x in range(size):
+        row = []
+        for y in range(size):
+            if white[x][y]:
+                row.append(Blank(values[x][y]) if (x, y) in givens else Blank())
+            else:
+                v = h = None
+                if x + 1 < size and white[x + 1][y]:
+                    v, i = 0, x + 1
+                    while i < size and white[i][y]:
+                        v, i = v + values[i][y], i + 1
+                if y + 1 < size and white[x][y + 1]:
+                    h, j = 0, y + 1
+                    while j < size and white[x][j]:
+                        h, j = h + values[x][j], j + 1
+                row.append(Brick(v = v, h = h))
+        board.append(row)
+    return board
+
+def _twoSolutions(white, values, givens):
+    """Return the values of up to two solutions of the puzzle."""
+    board = KakuroBoard(_makeBoard(white, values, givens))
+    solutions = []
+    for tiles in board.solve():
+        solutions.append([tile.possibleValues[0] for tile in tiles])
+        if len(solutions) == 2:
+            break
+    return solutions
+
+def generate(size, density = 0.75, seed = None):
+    """Return the board, as rows of Brick and Blank, of a random puzzle of
+    size x size cells (first row and column included) with a unique solution.
+    The same seed always gives the same puzzle."""
+
+    rng = random.Random(seed)
+    while True:
+        white = _makeLayout(rng, size, density)
+        if not any(any(row) for row in white):
+            continue
+        values = _fill(rng, white)
+        if values is not None:
+            break
+
+    givens = set()
+    cells = [(x, y) for x in range(size) for y in range(size) if white[x][y]]
+    while True:
+        solutions = _twoSolutions(white, values, givens)
+        if len(solutions) < 2:
+            break
+        # Give the value of a cell where the two solutions differ.
+        different = [cell for cell, a, b in zip(cells, *solutions) if a != b]
+        givens.add(rng.choice(different))
+
+    # Drop the givens that turned out not to be needed for the uniqueness.
+    for cell in sorted(givens):
+        givens.remove(cell)
+        if not KakuroBoard(_makeBoard(white, values, givens)).isUnique():
+            givens.add(cell)
+
+    return _makeBoard(white, values, givens)
+
+def generateText(size, density = 0.75, seed = None):
+    """Same as generate, but return the content of the puzzle file."""
+    return KakuroBoard._toText(generate(size, density, seed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Generate a random Kakuro puzzle.")
+    parser.add_argument("size", type = int, help = "number of rows and columns")
+    parser.add_argument("--density", type = float, default = 0.75,
+                        help = "probability of a cell to be white before the fix of the runs")
+    parser.add_argument("--seed", type = int, default = None)
+    args = parser.parse_args()
+
+    print(generateText(args.size, args.density, args.seed), end = "")
@@ -0,0 +1,224 @@
+"""Parallel search for a single hard board, used by KakuroBoard.solve when it
+is given a number of workers.
+
+The search tree is expanded breadth-first for a few levels in the main
+process, branching like KakuroBoard._solve on the tile with the fewest
+possible values. The resulting subproblems, i.e. the domains of the tiles
+plus the configurations of the sums, are solved by a pool of worker
+processes. A worker that explores more than a budget of nodes gives up its
+subproblem and splits it one level further, sending the children back to be
+queued again, so that a single big subtree does not keep one worker busy
+while the others are idle.
+
+If after the first propagation the undecided tiles split in groups that share
+no sum, the biggest group is instead solved this way as a board of its own,
+the smaller ones lazily in the main process, and the solutions of the groups
+are combined as they are found."""
+
+import concurrent.futures
+
+from KakuroSolver import KakuroBoard
+from utils.Domain import COUNT, MIN, toValues
+from utils.KakuroTiles import Blank
+from utils.Trail import Trail
+
+
+def getState(tiles, sums):
+    """Return the state of the board, to be sent to another process."""
+    return [tile.mask for tile in tiles], [sum.getState() for sum in sums]
+
+def setState(tiles, sums, state):
+    """Restore the state returned by getState on a board with the same
+    structure."""
+    masks, sumStates = state
+    for tile, mask in zip(tiles, masks):
+        tile.mask = mask
+    for sum, sumState in zip(sums, sumStates):
+        sum.setState(sumState)
+
+def _isComplete(tiles):
+    return all([COUNT[tile.mask] == 1 for tile in tiles])
+
+def _getValues(tiles):
+    return [MIN[tile.mask] for tile in tiles]
+
+def _toTiles(values):
+    return [Blank(value, specificId = i) for i, value in enumerate(values)]
+
+def expand(tiles, sums, state):
+    """Branch once on a propagated, not complete, state. Return the values of
+    the solutions found and the states of the children still to solve."""
+
+    setState(tiles, sums, state)
+    trail = Trail()
+    tileID = KakuroBoard._branchingTile(tiles)
+
+    solutions, children = [], []
+    for value in toValues(tiles[tileID].mask):
+        checkpoint = trail.checkpoint()
+        tiles[tileID]._setValue(value, trail)
+        if KakuroBoard._propagate(tiles, sums, trail, None, [tiles[tileID]]):
+            if _isComplete(tiles):
+                solutions.append(_getValues(tiles))
+            else:
+                children.append(getState(tiles, sums))
+        trail.undo(checkpoint)
+
+    return solutions, children
+
+
+#---------Worker side
+# Every worker builds the structure of the board once and then only
+# restores the state of each subproblem on it.
+_tiles = None
+_sums = None
+
+class _Split(Exception):
+    """Raised when a subproblem goes over the budget of nodes."""
+    pass
+
+def _initWorker(structure):
+    global _tiles, _sums
+    numTiles, sumStructure = structure
+    _tiles = [Blank(specificId = i) for i in range(numTiles)]
+    _sums = [sumClass(value, [_tiles[i] for i in ids]) for sumClass, value, ids in sumStructure]
+
+def _solveSubproblem(state, nodeBudget):
+    """Solve a subproblem. Return the values of the solutions and, if the
+    budget ran out, the states of the children to solve instead."""
+
+    setState(_tiles, _sums, state)
+    trail = Trail()
+    solutions = []
+    nodes = 0
+
+    def search(changed = None):
+        nonlocal nodes
+        if not KakuroBoard._propagate(_tiles, _sums, trail, None, changed):
+            return
+        if _isComplete(_tiles):
+            solutions.append(_getValues(_tiles))
+            return
+
+        nodes += 1
+        if nodes > nodeBudget:
+            raise _Split()
+
+        tileID = KakuroBoard._branchingTile(_tiles)
+        for value in toValues(_tiles[tileID].mask):
+            checkpoint = trail.checkpoint()
+            _tiles[tileID]._setValue(value, trail)
+            search([_tiles[tileID]])
+            trail.undo(checkpoint)
+
+    try:
+        search()
+    except _Split:
+        # The solutions found so far are found again in the children.
+        return expand(_tiles, _sums, state)
+    return solutions, []
+
+
+def _groupBoard(tiles, group):
+    """Return a board with the tiles of the group plus the decided tiles of
+    their sums, and the ids of the tiles of the board in tiles."""
+
+    sums = list(dict.fromkeys(sum for tile in group for sum in tile.sums))
+    ids = list(dict.fromkeys(tile._id for sum in sums for tile in sum.tileList))
+    index = {tileID: i for i, tileID in enumerate(ids)}
+    groupTiles = []
+    for i, tileID in enumerate(ids):
+        tile = Blank(specificId = i)
+        tile.mask = tiles[tileID].mask
+        groupTiles.append(tile)
+    groupSums = [type(sum)(sum.value, [groupTiles[index[tile._id]] for tile in sum.tileList])
+                 for sum in sums]
+    return KakuroBoard.fromSums(groupTiles, groupSums), ids
+
+def _solveGroups(tiles, groups, workers, splitDepth, nodeBudget):
+    """Yield the list of tiles of every combination of the solutions of the
+    groups, as soon as they are found.
+
+    The biggest group is solved like a board of its own by solveParallel,
+    split and queued over the workers. The others, smaller, are searched
+    lazily in this process (see KakuroBoard._solveGroups): only their first
+    solution is looked for at once, to give up early if one has none."""
+
+    def search(group):
+        board, ids = _groupBoard(tiles, group)
+        for solution in board.solve():
+            yield ids, [tile.mask for tile in solution]
+
+    groups = sorted(groups, key = len)
+    others = []
+    for group in groups[:-1]:
+        source = search(group)
+        first = next(source, None)
+        if first is None:
+            return
+        others.append(([first], source))
+
+    board, ids = _groupBoard(tiles, groups[-1])
+    masks = [tile.mask for tile in tiles]
+    for solution in solveParallel(board, workers, splitDepth, nodeBudget, decompose = False):
+        for parts in KakuroBoard._combine(others, [(ids, [tile.mask for tile in solution])]):
+            for groupIds, groupMasks in parts:
+                for tileID, mask in zip(groupIds, groupMasks):
+                    masks[tileID] = mask
+            yield [Blank(MIN[mask], specificId = i) for i, mask in enumerate(masks)]
+
+def solveParallel(board, workers = None, splitDepth = 2, nodeBudget = 5000, decompose = True):
+    """Solve the board over a pool of workers processes, yielding the list of
+    tiles of every solution as soon as it arrives, so not in search order.
+
+    splitDepth is the number of levels of the search tree expanded before
+    handing the subproblems to the workers, nodeBudget the number of nodes a
+    worker explores in a subproblem before splitting it. With decompose,
+    independent groups of tiles are solved apart (see the module
+    documentation)."""
+
+    tiles, sums = KakuroBoard._mycopy(board.tiles, board.sums)
+    if not KakuroBoard._propagate(tiles, sums):
+        return
+    if _isComplete(tiles):
+        yield tiles
+        return
+
+    if decompose:
+        groups = KakuroBoard._components([tile for tile in tiles if COUNT[tile.mask] > 1])
+        if len(groups) > 1:
+            for solution in _solveGroups(tiles, groups, workers, splitDepth, nodeBudget):
+                yield solution
+            return
+
+    frontier = [getState(tiles, sums)]
+    for depth in range(splitDepth):
+        children = []
+        for state in frontier:
+            solutions, states = expand(tiles, sums, state)
+            for values in solutions:
+                yield _toTiles(values)
+            children.extend(states)
+        frontier = children
+
+    if not frontier:
+        return
+
+    structure = (len(tiles), [(type(sum), sum.value, [tile._id for tile in sum.tileList])
+                              for sum in sums])
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers = workers,
+                    initializer = _initWorker, initargs = (structure,))
+    try:
+        pending = {executor.submit(_solveSubproblem, state, nodeBudget) for state in frontier}
+        while pending:
+            done, pending = concurrent.futures.wait(pending,
+                                return_when = concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                solutions, states = future.result()
+                for values in solutions:
+                    yield _toTiles(values)
+                for state in states:
+                    pending.add(executor.submit(_solveSubproblem, state, nodeBudget))
+    finally:
+        # Also when the caller stops early: drop the subproblems not started.
+        executor.shutdown(wait = False, cancel_futures = True)
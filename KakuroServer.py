@@ -0,0 +1,385 @@
+"""Local solve service: JSON over HTTP on asyncio, with a bounded pool of
+worker processes.
+
+    python KakuroServer.py --port 8080 --workers 4
+
+POST /solve takes a puzzle in the CSV format read by KakuroBoard._parse,
+either as the body (options in the query string, /solve?deadline=2) or as a
+JSON body {"puzzle": "<CSV content>", ...options}. The options are:
+
+    deadline      seconds for the whole request, queue included, at most
+                  the deadline of the service
+    maxNodes      nodes of the search tree before giving up
+    maxSolutions  solutions to send at most
+    mode, strategy, inference   as for KakuroBoard.solve
+
+The answer is streamed as JSON lines while the solutions are found: first
+{"id": ...}, then {"solution": grid} for every solution (grid as in
+KakuroBatch) and at last {"status": ..., "solutions": n, "nodes": n,
+"time": seconds}, where status is "complete", "limit" (maxSolutions
+reached), "deadline", "budget" (maxNodes reached, the record also has the
+number of tiles "fixed" by the propagation), "cancelled" or "error".
+
+DELETE /solve/<id> cancels a request, as does closing its connection.
+GET /status returns the number of running and queued requests.
+
+When every worker is busy and maxQueue requests are already waiting, a
+request is rejected at once with 503. A worker running past the deadline
+of its request, or cancelled, is killed and replaced by a new one.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+import urllib.parse
+
+WORKER = os.path.abspath(__file__)
+
+# Options of a request given to the workers.
+_OPTIONS = {"maxNodes": int, "maxSolutions": int, "mode": str, "strategy": str,
+            "inference": str}
+
+
+#---------Worker side
+def _solveJob(job):
+    """Solve a job, yielding the records to send back."""
+
+    from KakuroSolver import KakuroBoard
+    from KakuroBatch import toGrid
+    from utils.Budget import BudgetExhausted
+    from utils.Stats import Stats
+
+    maxSolutions = job.get("maxSolutions")
+    stats = Stats()
+
+    options = {name: job[name] for name in ("mode", "strategy", "inference", "maxNodes")
+               if name in job}
+    status = "complete"
+    solutions = 0
+    fixed = None
+    try:
+        board = KakuroBoard.fromText(job["puzzle"])
+        for tiles in board.solve(stats = stats, **options):
+            solutions += 1
+            yield {"solution": toGrid(board.board, tiles)}
+            if maxSolutions is not None and solutions >= maxSolutions:
+                status = "limit"
+                break
+    except BudgetExhausted as e:
+        status = "budget"
+        fixed = e.result.fixed
+    except Exception as e:
+        status = "error"
+        yield {"error": "%s: %s" % (type(e).__name__, e)}
+    record = {"status": status, "solutions": solutions, "nodes": stats.nodes}
+    if fixed is not None:
+        record["fixed"] = fixed
+    yield record
+
+def _workerMain():
+    """Read the jobs from stdin, one JSON line each, and write their records
+    to stdout as JSON lines."""
+
+    for line in sys.stdin:
+        for record in _solveJob(json.loads(line)):
+            sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+
+
+#---------Server side
+class Rejected(Exception):
+    """Raised when a request cannot be queued."""
+    pass
+
+class SolveService:
+    """The pool of workers and the queue of the requests. solve() can be used
+    directly, serve() puts the HTTP front end on it."""
+
+    def __init__(self, workers = None, maxQueue = 16, deadline = 30.0, maxNodes = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.maxQueue = maxQueue
+        self.deadline = deadline
+        self.maxNodes = maxNodes
+
+        self._idle = None
+        self._waiting = 0
+        self._running = 0
+        self._ids = itertools.count(1)
+        self._requests = {}
+        self._cancelled = set()
+
+    async def start(self):
+        """Start the workers."""
+        self._idle = asyncio.Queue()
+        for _ in range(self.workers):
+            self._idle.put_nowait(await self._spawn())
+
+    async def _spawn(self):
+        return await asyncio.create_subprocess_exec(sys.executable, WORKER, "--worker",
+                        stdin = asyncio.subprocess.PIPE, stdout = asyncio.subprocess.PIPE,
+                        limit = 1 << 24)
+
+    async def _replace(self, worker):
+        """Kill a worker whose job is not over and start a new one."""
+        try:
+            worker.kill()
+        except ProcessLookupError:
+            pass
+        await worker.wait()
+        self._idle.put_nowait(await self._spawn())
+
+    def status(self):
+        return {"workers": self.workers, "running": self._running, "queued": self._waiting,
+                "maxQueue": self.maxQueue}
+
+    async def solve(self, job):
+        """Solve a job (the JSON options of a request, with the puzzle),
+        yielding its records as they come. Raise Rejected if the queue is
+        full."""
+
+        start = time.perf_counter()
+        # A request can only shorten the deadline of the service.
+        deadline = job.get("deadline")
+        if deadline is None:
+            deadline = self.deadline
+        elif self.deadline is not None:
+            deadline = min(deadline, self.deadline)
+        if self.maxNodes is not None:
+            job["maxNodes"] = min(job.get("maxNodes", self.maxNodes), self.maxNodes)
+        job = {name: value for name, value in job.items() if name == "puzzle" or name in _OPTIONS}
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - (time.perf_counter() - start))
+
+        # Capacity is taken here, before the first yield and so before any
+        # await: the requests admitted but not yet given a worker are already
+        # counted as waiting.
+        if self._running + self._waiting >= self.workers + self.maxQueue:
+            raise Rejected("queue full")
+        self._waiting += 1
+
+        requestId = next(self._ids)
+        self._requests[requestId] = asyncio.current_task()
+        solutions = 0
+        worker = None
+        done = False
+        try:
+            try:
+                yield {"id": requestId}
+                worker = await asyncio.wait_for(self._idle.get(), remaining())
+            finally:
+                self._waiting -= 1
+            self._running += 1
+
+            worker.stdin.write((json.dumps(job) + "\n").encode())
+            await worker.stdin.drain()
+            while True:
+                line = await asyncio.wait_for(worker.stdout.readline(), remaining())
+                if not line:
+                    yield {"status": "error", "error": "the worker died", "solutions": solutions,
+                           "time": time.perf_counter() - start}
+                    return
+                record = json.loads(line)
+                if "solution" in record:
+                    solutions += 1
+                if "status" in record:
+                    done = True
+                    record["time"] = time.perf_counter() - start
+                yield record
+                if done:
+                    return
+                # The cancellation of the task can be lost when it comes
+                # together with a line.
+                if requestId in self._cancelled:
+                    raise asyncio.CancelledError()
+        except asyncio.TimeoutError:
+            yield {"status": "deadline", "solutions": solutions,
+                   "time": time.perf_counter() - start}
+        except asyncio.CancelledError:
+            yield {"status": "cancelled", "solutions": solutions,
+                   "time": time.perf_counter() - start}
+        finally:
+            del self._requests[requestId]
+            self._cancelled.discard(requestId)
+            if worker is not None:
+                self._running -= 1
+                if done:
+                    self._idle.put_nowait(worker)
+                else:
+                    # Its job may still be running: start a new one.
+                    asyncio.ensure_future(self._replace(worker))
+
+    def cancel(self, requestId):
+        """Cancel a request, return False if it is not running or queued."""
+        task = self._requests.get(requestId)
+        if task is None:
+            return False
+        self._cancelled.add(requestId)
+        task.cancel()
+        return True
+
+    #---------HTTP
+    async def _handle(self, reader, writer):
+        try:
+            requestLine = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1")
+                if line in ("\r\n", "\n", ""):
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                length = int(headers.get("content-length", 0))
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                return await self._respond(writer, 400, {"error": "bad content-length"})
+            body = await reader.readexactly(length)
+
+            if len(requestLine) < 2:
+                return await self._respond(writer, 400, {"error": "bad request"})
+            method, url = requestLine[0], urllib.parse.urlsplit(requestLine[1])
+
+            if method == "GET" and url.path == "/status":
+                return await self._respond(writer, 200, self.status())
+            if method == "DELETE" and url.path.startswith("/solve/"):
+                try:
+                    found = self.cancel(int(url.path[len("/solve/"):]))
+                except ValueError:
+                    found = False
+                return await self._respond(writer, 200 if found else 404, {"cancelled": found})
+            if method != "POST" or url.path != "/solve":
+                return await self._respond(writer, 404, {"error": "not found"})
+
+            try:
+                job = self._parseJob(headers, body, url.query)
+            except (ValueError, KeyError) as e:
+                return await self._respond(writer, 400, {"error": str(e)})
+            await self._stream(reader, writer, job)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parseOption(name, value):
+        """Return an option of a request, from the JSON body or the query
+        string, with the type the workers expect. Raise ValueError if it is
+        not valid."""
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError("bad %s: %r" % (name, value))
+        if name == "deadline":
+            option = float(value)
+            if not (0 <= option < float("inf")):
+                raise ValueError("bad %s: %r" % (name, value))
+        elif _OPTIONS[name] is str:
+            if not isinstance(value, str):
+                raise ValueError("bad %s: %r" % (name, value))
+            option = value
+        else:
+            if isinstance(value, float) and not value.is_integer():
+                raise ValueError("bad %s: %r" % (name, value))
+            try:
+                option = int(value)
+            except OverflowError:
+                raise ValueError("bad %s: %r" % (name, value))
+            if option < 0:
+                raise ValueError("bad %s: %r" % (name, value))
+        return option
+
+    @staticmethod
+    def _parseJob(headers, body, query):
+        if headers.get("content-type", "").startswith("application/json"):
+            job = json.loads(body)
+            if not isinstance(job, dict):
+                raise ValueError("the body is not a JSON object")
+            if not isinstance(job.get("puzzle"), str):
+                raise ValueError("missing puzzle")
+            options = list(job.items())
+        else:
+            job = {"puzzle": body.decode("utf8")}
+            options = urllib.parse.parse_qsl(query)
+        for name, value in options:
+            if name == "deadline" or name in _OPTIONS:
+                job[name] = SolveService._parseOption(name, value)
+        return job
+
+    async def _respond(self, writer, code, record):
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                  503: "Service Unavailable"}[code]
+        body = (json.dumps(record) + "\n").encode()
+        writer.write(("HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n"
+                      "Content-Length: %d\r\nConnection: close\r\n\r\n"
+                      % (code, reason, len(body))).encode() + body)
+        await writer.drain()
+
+    async def _watch(self, reader, requestId):
+        """Cancel a request as soon as its client closes the connection, not
+        only at the next record written to it: a worker can go on for long
+        without finding a solution."""
+        try:
+            while await reader.read(1 << 16):
+                pass
+        except ConnectionError:
+            pass
+        self.cancel(requestId)
+
+    async def _stream(self, reader, writer, job):
+        records = self.solve(job)
+        try:
+            first = await records.__anext__()
+        except Rejected as e:
+            return await self._respond(writer, 503, {"error": str(e)})
+
+        watcher = asyncio.ensure_future(self._watch(reader, first["id"]))
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Connection: close\r\n\r\n")
+        try:
+            writer.write((json.dumps(first) + "\n").encode())
+            await writer.drain()
+            async for record in records:
+                writer.write((json.dumps(record) + "\n").encode())
+                await writer.drain()
+        finally:
+            watcher.cancel()
+            # If the client went away, this stops the job.
+            await records.aclose()
+
+    async def serve(self, host = "127.0.0.1", port = 8080):
+        await self.start()
+        server = await asyncio.start_server(self._handle, host, port, limit = 1 << 24)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Local Kakuro solve service.")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8080)
+    parser.add_argument("-w", "--workers", type = int, default = None,
+                        help = "number of worker processes (default: number of CPUs)")
+    parser.add_argument("--max-queue", type = int, default = 16,
+                        help = "requests waiting for a worker before rejecting the others")
+    parser.add_argument("--deadline", type = float, default = 30.0,
+                        help = "default deadline of a request, in seconds")
+    parser.add_argument("--max-nodes", type = int, default = None,
+                        help = "highest search-node budget a request can have")
+    parser.add_argument("--worker", action = "store_true", help = argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        return _workerMain()
+    service = SolveService(args.workers, args.max_queue, args.deadline, args.max_nodes)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
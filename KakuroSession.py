@@ -0,0 +1,163 @@
+"""Interactive solving session, for an editor that checks the board after
+every change of the user.
+
+The session builds the board and propagates it once, then keeps the
+propagated state: every assignment of the user only propagates from the
+changed cell, in place with a trail, and is undone going back to the
+checkpoint taken before it. The cells are addressed as (row, column) of the
+board.
+
+    session = KakuroSession(KakuroBoard("Kakuro.txt"))
+    session.assign((1, 2), 7)
+    session.isStillSolvable()
+    session.nextDeduction()
+    session.unassign((1, 2))
+"""
+
+from KakuroSolver import KakuroBoard
+from utils.Domain import BIT, COUNT, MIN, toValues
+from utils.KakuroTiles import Blank, Brick
+from utils.Trail import Trail
+
+
+class KakuroSession:
+    """A board being solved by the user, see the module documentation."""
+
+    def __init__(self, board):
+        if not isinstance(board, KakuroBoard):
+            board = KakuroBoard(board)
+        self.board = board
+        self.tiles, self.sums = KakuroBoard._mycopy(board.tiles, board.sums)
+        self.trail = Trail()
+
+        self._cells = {}
+        for x, row in enumerate(board.board):
+            for y, tile in enumerate(row):
+                if isinstance(tile, Blank):
+                    self._cells[(x, y)] = tile._id
+        self._positions = {tileID: cell for cell, tileID in self._cells.items()}
+
+        # The assignments of the user, in order, as [cell, value, checkpoint
+        # before it, consistent after it].
+        self._stack = []
+        self._rootConsistent = KakuroBoard._propagate(self.tiles, self.sums, self.trail)
+        self._solvable = None
+
+    def _tile(self, cell):
+        tileID = self._cells.get(tuple(cell))
+        if tileID is None:
+            raise ValueError("Not a blank cell: %s" % (cell,))
+        return self.tiles[tileID]
+
+    def _isConsistent(self):
+        return self._stack[-1][3] if self._stack else self._rootConsistent
+
+    def assign(self, cell, value):
+        """Give value to the cell, replacing the value the user gave it
+        before if any. Return False if the board turns out to have no
+        solution."""
+
+        if not 1 <= value <= 9:
+            raise ValueError("Not a digit: %s" % value)
+        cell = tuple(cell)
+        tile = self._tile(cell)
+        if any(entry[0] == cell for entry in self._stack):
+            self.unassign(cell)
+
+        consistent = self._isConsistent()
+        checkpoint = self.trail.checkpoint()
+        if consistent and tile.mask & BIT[value]:
+            tile._setValue(value, self.trail)
+            consistent = KakuroBoard._propagate(self.tiles, self.sums, self.trail, None, [tile])
+        else:
+            # Either the value was already excluded or the board has no
+            # solution anyway: there is nothing to propagate.
+            self.trail.record(tile, 'mask', tile.mask)
+            tile.mask = BIT[value]
+            consistent = False
+        self._stack.append([cell, value, checkpoint, consistent])
+        self._solvable = None
+        return consistent
+
+    def unassign(self, cell):
+        """Clear the value the user gave to the cell. The assignments made
+        after it are undone as well and then made again."""
+
+        cell = tuple(cell)
+        for position, entry in enumerate(self._stack):
+            if entry[0] == cell:
+                break
+        else:
+            raise ValueError("No value assigned to %s" % (cell,))
+
+        later = self._stack[position + 1:]
+        self.trail.undo(entry[2])
+        del self._stack[position:]
+        self._solvable = None
+        for laterCell, value, _, _ in later:
+            self.assign(laterCell, value)
+
+    def undo(self):
+        """Clear the last assignment of the user, if any."""
+        if self._stack:
+            cell, _, checkpoint, _ = self._stack.pop()
+            self.trail.undo(checkpoint)
+            self._solvable = None
+
+    def assignments(self):
+        """Return the values given by the user, by cell."""
+        return {cell: value for cell, value, _, _ in self._stack}
+
+    def candidates(self, cell):
+        """Return the values the cell can still have after the propagation."""
+        return toValues(self._tile(cell).mask)
+
+    def isStillSolvable(self):
+        """Return True if the board with the values given by the user still
+        has a solution. If the propagation did not already find it out, a
+        search for one solution is run (and remembered until the next
+        change)."""
+
+        if not self._isConsistent():
+            return False
+        if self._solvable is None:
+            # The state is at a fixpoint, so there is nothing to propagate
+            # first, and _count leaves it as it was.
+            self._solvable = KakuroBoard._count(self.tiles, self.sums, self.trail, 1,
+                                                self.tiles, []) > 0
+        return self._solvable
+
+    def nextDeduction(self):
+        """Return a hint: a cell not filled by the user whose value follows
+        from the propagation, as a dict with the cell, the value and the sum
+        that justifies it (with the fewest configurations left among the
+        sums of the cell): the cell of its clue, its direction and its value.
+        Return None if there is no such cell or the board has no solution."""
+
+        if not self._isConsistent():
+            return None
+        assigned = {cell for cell, _, _, _ in self._stack}
+        for cell in sorted(self._cells):
+            tile = self._tile(cell)
+            if cell in assigned or COUNT[tile.mask] != 1:
+                continue
+            # A given value is not a deduction.
+            if COUNT[self.board.tiles[tile._id].mask] == 1:
+                continue
+            sum = min(tile.sums, key = len)
+            return {"cell": cell, "value": MIN[tile.mask], "sum": self._clue(sum)}
+        return None
+
+    def _clue(self, sum):
+        """Return the cell of the clue of the sum, its direction and its
+        value."""
+
+        x, y = self._positions[sum.tileList[0]._id]
+        if len(sum.tileList) > 1:
+            horizontal = self._positions[sum.tileList[1]._id][0] == x
+        else:
+            left = self.board.board[x][y - 1]
+            horizontal = isinstance(left, Brick) and left.horizontalSum == sum.value
+        if horizontal:
+            return {"cell": (x, y - 1), "direction": "horizontal", "value": sum.value}
+        return {"cell": (x - 1, y), "direction": "vertical", "value": sum.value}
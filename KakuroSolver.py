@@ -1,11 +1,43 @@
+import heapq
+import time
+
 from utils.KakuroTiles import Brick, Blank
-from utils.Sum import Sum
+from utils.Sum import Sum, getPermutations
+from utils.CompactSum import CompactSum
+from utils.Domain import BIT, COUNT, MIN, toValues
+from utils.Trail import Trail
+from utils.Heuristics import STRATEGIES, MinRemainingValues
+from utils.Probing import ProbeCache
+from utils.SolutionCache import fingerprint
+from utils.Budget import Budget, BudgetExhausted, SearchResult
 
 class KakuroBoard:
     """A Kakuro board is represented by a two dimensional array with Tile of
     type KakuroTile representing the data at position x,y."""
 
-    def __init__(self, board, tiles = []):
+    # Search modes: on each branch either copy the whole board or change the
+    # domains in place, recording the changes on a trail to undo them.
+    COPY = "copy"
+    TRAIL = "trail"
+
+    # Backends for the configurations of the sums: python lists, NumPy
+    # arrays (needs numpy installed) or bytes columns (see CompactSum), which
+    # take a fraction of the memory of the lists on big boards. NumPy only
+    # pays off on sums with many configurations, so with the NUMPY backend
+    # the smaller sums stay python.
+    PYTHON = "python"
+    NUMPY = "numpy"
+    COMPACT = "compact"
+    NUMPY_MIN_CONFIGURATIONS = 256
+
+    # Inference levels of the search: GAC only, or also singleton arc
+    # consistency (probing every value, see _probe) before the search or at
+    # every node.
+    GAC = "gac"
+    SAC_ROOT = "sac-root"
+    SAC = "sac"
+
+    def __init__(self, board, tiles = None, backend = PYTHON):
 
         def createSum(value, tiles):
             blocks = []
@@ -13,7 +45,10 @@ class KakuroBoard:
                 if isinstance(tile, Brick):
                     break
                 blocks.append(tile)
-            return Sum(value, blocks)
+            return KakuroBoard._createSum(value, blocks, backend)
+
+        if backend not in (KakuroBoard.PYTHON, KakuroBoard.NUMPY, KakuroBoard.COMPACT):
+            raise ValueError("Unknown backend: %s" % backend)
 
         if isinstance(board, str):
             board = KakuroBoard._parse(board)
@@ -26,7 +61,19 @@ class KakuroBoard:
         # in the following way:
         # sum, [Blanks in the sum]
         sums = []
-        if self.tiles == []:
+        if self.tiles is None:
+            # The blanks are numbered per board, so that the id of a blank is
+            # its index in self.tiles whatever other board was created before
+            # in the same process. It has to be done before creating the sums,
+            # which index their tiles by id.
+            self.tiles = []
+            for row in board:
+                for tile in row:
+                    if isinstance(tile, Blank):
+                        tile._id = len(self.tiles)
+                        tile.sums = []
+                        self.tiles.append(tile)
+
             for x, row in enumerate(board):
                 for y, tile in enumerate(row):
                     # If the tile is a sum, process the sum.
@@ -37,12 +84,48 @@ class KakuroBoard:
                         if tile.horizontalSum:
                             sums.append(createSum(tile.horizontalSum, row[y+1:]))
 
-                    elif isinstance(tile, Blank):
-                        self.tiles.append(tile)
+            sums = [sum for sum in sums if sum is not None]
+            for n, sum in enumerate(sums):
+                sum._id = n
 
         # We have the structure.
         self.sums = sums
 
+    @classmethod
+    def fromText(cls, text, **kwargs):
+        """Create a board from the content of a puzzle file (see _parse)."""
+        return cls(KakuroBoard._parseText(text), **kwargs)
+
+    @classmethod
+    def fromSums(cls, tiles, sums, board = None):
+        """Create a board from its blanks, numbered in reading order, and its
+        sums, already built (see KakuroArchive). Without the grid of tiles
+        the board can be solved but not printed."""
+
+        self = cls.__new__(cls)
+        self.board = board
+        self.tiles = tiles
+        self.sums = sums
+        for n, sum in enumerate(sums):
+            sum._id = n
+        return self
+
+    @staticmethod
+    def _createSum(value, blocks, backend = PYTHON):
+        """Return the sum of the blanks, None if there are none: a clue with
+        no blanks to fill is not a constraint."""
+
+        if not blocks:
+            return None
+        if backend == KakuroBoard.NUMPY and \
+            len(getPermutations(value, len(blocks))) >= KakuroBoard.NUMPY_MIN_CONFIGURATIONS:
+            # Optional dependency, imported only when asked for.
+            from utils.NumpySum import NumpySum
+            return NumpySum(value, blocks)
+        if backend == KakuroBoard.COMPACT:
+            return CompactSum(value, blocks)
+        return Sum(value, blocks)
+
     def __repr__(self):
         res = ""
         pr = lambda x: x if isinstance(x, Brick) else self.tiles[x._id]
@@ -61,8 +144,45 @@ class KakuroBoard:
         copyBoard = [[tile.deepcopy() for tile in row] for row in self.board]
         return KakuroBoard(copyBoard)
 
-    def solve(self):
-        """Solve the board."""
+    def solve(self, mode = TRAIL, workers = None, splitDepth = 2, stats = None, strategy = None,
+              inference = GAC, probeBudget = None, cache = None, decompose = True,
+              deadline = None, maxNodes = None, maxRevisions = None):
+        """Solve the board, yielding the list of tiles of every solution.
+
+        In TRAIL mode (the default) the search works in place on a single
+        copy of the board and undoes its changes on backtrack, in COPY mode
+        the board is copied for every branch.
+
+        If a number of worker processes is given, the search tree is expanded
+        for splitDepth levels and the subproblems are solved in parallel (see
+        KakuroParallel); the solutions are then yielded as they arrive, not
+        in search order.
+
+        If a Stats object is given, the work done by the search (not the
+        parallel one) is counted on it and its hooks are called.
+
+        strategy chooses the branches of the search (not the parallel one):
+        a Strategy object or the name of a built-in one in
+        utils.Heuristics.STRATEGIES. The default is MinRemainingValues.
+
+        inference is the level of the inference of the search (not the
+        parallel one): GAC, SAC_ROOT or SAC. With probing, probeBudget is the
+        number of values probed at each node, None for no limit.
+
+        With decompose, whenever the undecided tiles split in groups that
+        share no sum, the groups are solved apart and their solutions are
+        combined, instead of searching them as a single tree. With workers,
+        the groups found after the first propagation are solved in parallel.
+
+        If a SolutionCache is given and it has all the solutions of the
+        board, or of its transpose, they are yielded without any search.
+        Otherwise the solutions found are stored in it, all of them or the
+        ones found before the caller stopped.
+
+        The search (not the parallel one) can be given a budget: a deadline
+        in seconds from now, a number of nodes and a number of revisions of
+        the GAC queue. When one runs out, BudgetExhausted is raised with
+        the SearchResult of the search so far (see solveAnytime)."""
         # Making a copy, since we don't want to change the actual
         # Blank tiles themselves through computation. Thus, they are preserved
         # and this class represents a fresh, clean sheet of paper with no
@@ -70,75 +190,543 @@ class KakuroBoard:
 
         # Now we use the auxiliary method on the data structure copy until all
         # the tiles are solved.
-        return self._solve(*KakuroBoard._mycopy(self.tiles, self.sums))
+        if cache is not None:
+            if self.board is None:
+                raise ValueError("A board without its grid cannot be cached")
+            solutions = cache.solutions(self.board)
+            if solutions is not None:
+                return iter(solutions)
+            return self._fillCache(cache, self.solve(mode, workers, splitDepth, stats, strategy,
+                                                     inference, probeBudget, None, decompose,
+                                                     deadline, maxNodes, maxRevisions))
+        budget = None
+        if deadline is not None or maxNodes is not None or maxRevisions is not None:
+            if workers is not None:
+                raise ValueError("The parallel search has no budgets")
+            budget = Budget(deadline, maxNodes, maxRevisions)
+        if workers is not None:
+            from KakuroParallel import solveParallel
+            return solveParallel(self, workers, splitDepth, decompose = decompose)
+
+        search, tiles = self._search(mode, stats, strategy, inference, probeBudget, decompose,
+                                     budget)
+        if budget is None:
+            return search
+        return self._withinBudget(search, budget, tiles)
+
+    def solveAnytime(self, maxSolutions = None, deadline = None, maxNodes = None,
+                     maxRevisions = None, mode = TRAIL, stats = None, strategy = None,
+                     inference = GAC, probeBudget = None, decompose = True):
+        """Solve the board within the budgets, as in solve, and return a
+        SearchResult: the solutions found, up to maxSolutions, whether the
+        search finished, found no solution or ran out of budget, and the
+        domains propagated at the root, which narrow the values of the
+        tiles also when the search did not finish."""
+
+        budget = Budget(deadline, maxNodes, maxRevisions)
+        search, tiles = self._search(mode, stats, strategy, inference, probeBudget, decompose,
+                                     budget)
+        solutions = []
+        try:
+            for solution in search:
+                solutions.append(solution)
+                if maxSolutions is not None and len(solutions) >= maxSolutions:
+                    search.close()
+                    return KakuroBoard._result(SearchResult.LIMIT, solutions, budget, tiles)
+        except BudgetExhausted as e:
+            return KakuroBoard._result(SearchResult.BUDGET, solutions, budget, tiles, e.reason)
+        status = SearchResult.COMPLETE if solutions else SearchResult.UNSAT
+        return KakuroBoard._result(status, solutions, budget, tiles)
+
+    def _search(self, mode, stats, strategy, inference, probeBudget, decompose, budget):
+        """Return the sequential search of solve, not started, and the copy
+        of the tiles it works on."""
+
+        if strategy is None:
+            strategy = MinRemainingValues()
+        elif isinstance(strategy, str):
+            strategy = STRATEGIES[strategy]()
+        if inference == KakuroBoard.GAC:
+            probing = None
+        elif inference in (KakuroBoard.SAC_ROOT, KakuroBoard.SAC):
+            probing = ProbeCache(probeBudget, everyNode = (inference == KakuroBoard.SAC))
+        else:
+            raise ValueError("Unknown inference level: %s" % inference)
+
+        if mode == KakuroBoard.TRAIL:
+            trail = Trail()
+        elif mode == KakuroBoard.COPY:
+            trail = None
+        else:
+            raise ValueError("Unknown search mode: %s" % mode)
+
+        tiles, sums = KakuroBoard._mycopy(self.tiles, self.sums)
+        return self._solve(tiles, sums, trail, stats, strategy = strategy, probing = probing,
+                           decompose = decompose, budget = budget), tiles
+
+    def _withinBudget(self, search, budget, tiles):
+        """Yield the solutions of the search, adding the SearchResult of the
+        search so far to the BudgetExhausted raised when a budget runs
+        out."""
+
+        solutions = []
+        try:
+            for solution in search:
+                solutions.append(solution)
+                yield solution
+        except BudgetExhausted as e:
+            e.result = KakuroBoard._result(SearchResult.BUDGET, solutions, budget, tiles, e.reason)
+            raise
+
+    @staticmethod
+    def _result(status, solutions, budget, tiles, reason = None):
+        # Until the root is propagated the domains of the tiles are only
+        # reduced, never guessed, so they are as good as the root ones.
+        masks = budget.rootMasks
+        if masks is None:
+            masks = [tile.mask for tile in tiles]
+        return SearchResult(status, solutions, masks, reason, budget.nodes, budget.revisions,
+                            budget.elapsed())
+
+    def _fillCache(self, cache, search):
+        """Yield the solutions of the search, storing them in the cache when
+        it is over or the caller stops."""
+
+        key, order = fingerprint(self.board)
+        values = []
+        complete = False
+        try:
+            for tiles in search:
+                values.append([MIN[tiles[tileID].mask] for tileID in order])
+                yield tiles
+            complete = True
+        finally:
+            cache.put(key, values, complete)
+
+    def countSolutions(self, limit = None):
+        """Return the number of solutions of the board, stopping at limit if
+        given. No solution is built: the search works in place with a trail
+        and, where the undecided tiles split in groups that share no sum,
+        the solutions of every group are counted apart and multiplied."""
+
+        tiles, sums = KakuroBoard._mycopy(self.tiles, self.sums)
+        return KakuroBoard._count(tiles, sums, Trail(), limit, tiles)
+
+    def isUnique(self):
+        """Return True if the board has exactly one solution."""
+        return self.countSolutions(2) == 1
+
+    def _solve(self, tiles, sums, trail = None, stats = None, depth = 0, changed = None,
+               strategy = None, probing = None, decompose = False, partial = False,
+               budget = None):
+        """Search the solutions of the tiles, yielding their lists of tiles.
+        With partial the tiles are only a group of the board (see
+        _solveGroups) and the solutions are not counted on stats. If a
+        Budget is given, every node and revision is counted on it."""
+
+        if strategy is None:
+            strategy = MinRemainingValues()
+        if stats is not None:
+            stats.nodes += 1
+            stats.maxDepth = max(stats.maxDepth, depth)
+        if budget is not None:
+            budget.node()
+
+        if not KakuroBoard._propagate(tiles, sums, trail, stats, changed, strategy, budget):
+            if stats is not None:
+                stats.backtracks += 1
+            return False
+        isRoot = depth == 0 and not partial
+        if isRoot and budget is not None:
+            budget.rootMasks = [tile.mask for tile in tiles]
+
+        # Probing is done at the root and, if asked for, at every node. The
+        # root of a group (see _solveGroups, changed is []) is not probed
+        # again: its tiles were just probed with the rest of the board.
+        if probing is not None and changed != [] and (depth == 0 or probing.everyNode):
+            if not KakuroBoard._probe(tiles, sums, trail, stats, probing, strategy, budget):
+                if stats is not None:
+                    stats.backtracks += 1
+                return False
+            if isRoot and budget is not None:
+                budget.rootMasks = [tile.mask for tile in tiles]
+
+        #---------Backtrack
+        # If the board is complete, we are done.
+        if all([COUNT[tile.mask] == 1 for tile in tiles]):
+            # With the trail the tiles will be changed back on backtrack, so
+            # the solution is a copy of them.
+            solution = tiles if trail is None else [tile.deepcopy() for tile in tiles]
+            if stats is not None and not partial:
+                stats.solutions += 1
+                if stats.onSolution is not None:
+                    stats.onSolution(solution, depth)
+            yield solution
+            return
+
+        if decompose:
+            groups = KakuroBoard._components([tile for tile in tiles if COUNT[tile.mask] > 1])
+            if len(groups) > 1:
+                for solution in self._solveGroups(tiles, trail, stats, depth, groups, strategy,
+                                                  probing, partial, budget):
+                    yield solution
+                return
+
+        # Things are now stable, so we must branch: the strategy gives
+        # the branches, each a list of values to give to some tiles.
+        if stats is not None:
+            start = time.perf_counter()
+        branches = strategy.branches(tiles, sums)
+        if stats is not None:
+            stats.branchingTime += time.perf_counter() - start
+
+        for branch in branches:
+            if stats is not None and stats.onBranch is not None:
+                for tile, value in branch:
+                    stats.onBranch(tile._id, value, depth)
+
+            if trail is None:
+                # Create a copy of the board.
+                cTiles, cSums = KakuroBoard._mycopy(tiles, sums)
+                changedTiles = [cTiles[tile._id] for tile, value in branch]
+                for tile, (_, value) in zip(changedTiles, branch):
+                    tile._setValue(value)
 
-    def _solve(self, tiles, sums, add = []):
+                # Iteratively solve.
+                for solution in self._solve(cTiles, cSums, None, stats, depth + 1,
+                                            changedTiles, strategy, probing, decompose,
+                                            partial, budget):
+                    yield solution
+            else:
+                # Change the board in place and undo it after the branch.
+                checkpoint = trail.checkpoint()
+                for tile, value in branch:
+                    tile._setValue(value, trail)
+
+                for solution in self._solve(tiles, sums, trail, stats, depth + 1,
+                                            [tile for tile, value in branch], strategy,
+                                            probing, decompose, partial, budget):
+                    yield solution
 
-        def arc_reduce(arc):
-            """Revision face that recompute domain of node according constraint"""
-            # instead to compute every single time the new domain according all
-            # node involved in the hyper-node, all valid configurations are
-            # pre-computed and deleted invalideted configurations according
-            # domains modify
-            return arc[0].filterValuesFromSums() or arc[1].filterConfigFromTile(arc[0])
+                trail.undo(checkpoint)
+
+    def _solveGroups(self, tiles, trail, stats, depth, groups, strategy, probing, partial,
+                     budget = None):
+        """Solve apart the groups of undecided tiles, which share no sum,
+        yielding the lists of tiles of every combination of their solutions.
+
+        Every group is searched lazily, in place with a trail of its own
+        also in COPY mode, on its own copy of its tiles and sums, so the
+        searches can be interleaved. The biggest group is the outer loop; the solutions of
+        the others are kept as they are found and replayed for the next
+        solution of the groups before them. The first solution of every
+        other group is looked for at once: if one has none, neither has the
+        board, and the biggest group is not searched at all."""
+
+        def search(group):
+            groupSums = list(dict.fromkeys(sum for tile in group for sum in tile.sums))
+            memo = {tile._id: tile.deepcopy() for tile in group}
+            for sum in groupSums:
+                for tile in sum.tileList:
+                    if tile._id not in memo:
+                        memo[tile._id] = tile.deepcopy()
+            copySums = [sum.deepcopy(memo) for sum in groupSums]
+            copyTiles = [memo[tile._id] for tile in group]
+            for solution in self._solve(copyTiles, copySums, Trail(), stats, depth, [],
+                                        strategy, probing, True, True, budget):
+                yield [(tile._id, tile.mask) for tile in solution]
+
+        groups.sort(key = len)
+        others = []
+        for group in groups[:-1]:
+            source = search(group)
+            first = next(source, None)
+            if first is None:
+                if stats is not None:
+                    stats.backtracks += 1
+                return
+            others.append(([first], source))
+
+        position = {tile._id: i for i, tile in enumerate(tiles)}
+        for first in search(groups[-1]):
+            for parts in KakuroBoard._combine(others, [first]):
+                if budget is not None:
+                    budget.check()
+                solution = [tile.deepcopy() for tile in tiles]
+                for part in parts:
+                    for tileID, mask in part:
+                        solution[position[tileID]].mask = mask
+                if stats is not None and not partial:
+                    stats.solutions += 1
+                    if stats.onSolution is not None:
+                        stats.onSolution(solution, depth)
+                yield solution
+
+    @staticmethod
+    def _replay(cache, source):
+        """Yield the solutions of a group found so far, in cache, then find
+        more from source, adding them to cache."""
+        i = 0
+        while True:
+            if i == len(cache):
+                solution = next(source, None)
+                if solution is None:
+                    return
+                cache.append(solution)
+            yield cache[i]
+            i += 1
+
+    @staticmethod
+    def _combine(others, parts):
+        """Yield parts extended with every combination of the solutions of
+        the groups in others, each a (cache, source) pair for _replay."""
+        if not others:
+            yield parts
+            return
+        cache, source = others[0]
+        for part in KakuroBoard._replay(cache, source):
+            for combination in KakuroBoard._combine(others[1:], parts + [part]):
+                yield combination
+
+    @staticmethod
+    def _propagate(tiles, sums, trail = None, stats = None, changed = None, strategy = None,
+                   budget = None):
+        """Reduce the domains of the tiles and the configurations of the sums
+        with Node Consistency and GAC. Return False if the board turns out to
+        have no solution.
+
+        changed are the tiles whose domain changed since the last
+        propagation, which was at a fixpoint: only their sums are revised at
+        first. If it is None the whole board is propagated.
+
+        If a strategy is given, it is told about the sum whose revision
+        wiped out a domain. If a Budget is given, the revisions are counted
+        on it."""
 
         #--------Node Consistency
-        for x in tiles:
-            x.filterValuesFromSums() 
+        if changed is None:
+            if stats is not None:
+                start = time.perf_counter()
+            for x in tiles:
+                if x.filterValuesFromSums(trail) and stats is not None:
+                    stats.domainReductions += 1
+            if stats is not None:
+                stats.nodeConsistencyTime += time.perf_counter() - start
 
         #---------GAC (General Arc Consistency or hyper-arc consistency)
-        # make a list of hyper-node that must be computed
+        # The queue holds constraints (sums) rather than <X, c> pairs, each
+        # with the tiles whose domain changed since its last revision:
 
         # procedure GAC( <Vs, dom, Cs> )
-        #     to_do = { <X, c> ∣ c ∈ Cs and X ∈ scope(c) }
+        #     to_do = { c ∣ c ∈ Cs }, changed[c] = scope(c)
         #     while to_do ≠ {} do
-        #         select and remove <X, c> from to_do
-        #         let { Y1, …, Yk } = scope(c) ∖ {X}
-        #         ND := { x ∣ x ∈ dom [X] and exists y1 ∈ dom [ Y1 ] … y k ∈ dom [Yk] such that c ( X = x, Y1 = y1, …, Yk = yk) }
-        #         if ND ≠ dom [ X ] then
-        #             to_do := to_do ∪ { <Z, c′> ∣ { X, Z } ⊆ scope(c′) , c′≠c, Z≠X }
-        #             dom[X]:=ND
+        #         select and remove the c with fewest configurations from to_do
+        #         remove the configurations of c with a value not in dom[X], for X ∈ changed[c]
+        #         for X ∈ scope(c) do
+        #             ND := { x ∣ x ∈ dom [X] and x is the value of X in a configuration of c }
+        #             if ND ≠ dom [ X ] then
+        #                 to_do := to_do ∪ { c′ ∣ X ∈ scope(c′), c′≠c }, changed[c′] := changed[c′] ∪ { X }
+        #                 dom[X]:=ND
         #         return dom
 
-        worklist = set()
-        for x in tiles:
-            # if len(x.possibleValues) > 1:
-            for c in x.sums:
-                worklist.add((x, c))
-
-        # compute all elements in worklist list
-        while not len(worklist) == 0:
-            # remove one hyper-node
-            arc = worklist.pop()
-            if arc_reduce(arc):
-                if len(arc[0].possibleValues) == 0:
-                    return False
-                else:
-                    for c in arc[0].sums:
-                        for x in c.tileList:
-                            worklist.add((x, c))
-        #---------Backtrack
-        if all([len(sum.configurations) > 1 for sum in sums]):
-            return False
-        # If the board is complete, we are done.
-        if all([len(tile.possibleValues) == 1 for tile in tiles]):
-            yield tiles
-        else: # If any tiles are empty, we must backtrack.
-            # Things are now stable, so we must branch on a possible value.
-            branchingTiles = sorted([(len(tile.possibleValues), tile._id)
-                                    for tile in tiles if len(tile.possibleValues) > 1])
-            # Pick the tile with the fewest choices to minimize branching.
-            tileID = branchingTiles[0][1]
-
-            # Try all possible values for this tile.
-            for value in tiles[tileID].possibleValues:
-                # Create a copy of the board.
-                cTiles, cSums = KakuroBoard._mycopy(tiles, sums)
-                cTiles[tileID]._setValue(value)
+        # Since the configurations are pre-computed, revising a sum only
+        # costs a filter on the changed columns plus a scan for the values
+        # left in every column, and the sums with fewer configurations,
+        # cheaper and more constraining, are revised first.
+        if stats is not None:
+            start = time.perf_counter()
+        try:
+            pending = {}
+            if changed is None:
+                for sum in sums:
+                    pending[sum] = set(sum.tileList)
+            else:
+                for tile in changed:
+                    for sum in tile.sums:
+                        pending.setdefault(sum, set()).add(tile)
+            queue = [(len(sum), n, sum) for n, sum in enumerate(pending)]
+            heapq.heapify(queue)
+            counter = len(queue)
+
+            while queue:
+                sum = heapq.heappop(queue)[2]
+                if stats is not None:
+                    stats.revisions += 1
+                    before = len(sum)
+                if budget is not None:
+                    budget.revision()
+
+                if sum.filterConfigFromTiles(pending.pop(sum), trail):
+                    if stats is not None:
+                        stats.prunedConfigurations += before - len(sum)
+                    if len(sum) == 0:
+                        if strategy is not None:
+                            strategy.onFailure(sum)
+                        return False
+
+                for tile, mask in zip(sum.tileList, sum.getMasks()):
+                    newMask = tile.mask & mask
+                    if newMask != tile.mask:
+                        if newMask == 0:
+                            if strategy is not None:
+                                strategy.onFailure(sum)
+                            return False
+                        if stats is not None:
+                            stats.domainReductions += 1
+                        if trail is not None:
+                            trail.record(tile, 'mask', tile.mask)
+                        tile.mask = newMask
+
+                        # The other sums of the tile have to be revised on it.
+                        for other in tile.sums:
+                            if other is not sum:
+                                if other in pending:
+                                    pending[other].add(tile)
+                                else:
+                                    pending[other] = {tile}
+                                    heapq.heappush(queue, (len(other), counter, other))
+                                    counter += 1
+        finally:
+            if stats is not None:
+                stats.gacTime += time.perf_counter() - start
+
+        return True
 
-                # Iteratively solve.
-                for solution in self._solve(cTiles, cSums):
-                    yield solution
+    @staticmethod
+    def _probe(tiles, sums, trail, stats, probing, strategy = None, budget = None):
+        """Singleton arc consistency on a propagated board: give in turn each
+        value to each undecided tile and propagate, removing the values that
+        wipe out a domain, until no value is removed or the budget of probes
+        of the ProbeCache runs out. The probes with a witness in the cache
+        are skipped. Return False if the board turns out to have no
+        solution."""
+
+        if stats is not None:
+            start = time.perf_counter()
+        # The probes are undone with the trail of the search if there is one.
+        probeTrail = trail if trail is not None else Trail()
+        probesLeft = probing.budget
+        # The witnesses cover every tile the propagation can read, also the
+        # ones outside the tiles probed when they are only a group.
+        scope = list(dict.fromkeys(tiles + [other for sum in sums for other in sum.tileList]))
+        try:
+            removed = True
+            while removed:
+                removed = False
+                for tile in tiles:
+                    for value in toValues(tile.mask):
+                        # Earlier removals may have decided the tile already.
+                        if COUNT[tile.mask] == 1 or not tile.mask & BIT[value]:
+                            continue
+                        if budget is not None:
+                            budget.check()
+                        if probing.isSupported(tile, value, scope):
+                            if stats is not None:
+                                stats.probeHits += 1
+                            continue
+                        if probesLeft is not None:
+                            if probesLeft == 0:
+                                return True
+                            probesLeft -= 1
+                        if stats is not None:
+                            stats.probes += 1
+
+                        checkpoint = probeTrail.checkpoint()
+                        tile._setValue(value, probeTrail)
+                        supported = KakuroBoard._propagate(tiles, sums, probeTrail, None, [tile],
+                                                           None, budget)
+                        if supported:
+                            probing.store(tile, value, scope)
+                        probeTrail.undo(checkpoint)
+                        if supported:
+                            continue
+
+                        # The value has no solution: remove it for good.
+                        if stats is not None:
+                            stats.probeRemovals += 1
+                        if trail is not None:
+                            trail.record(tile, 'mask', tile.mask)
+                        tile.mask &= ~BIT[value]
+                        if not KakuroBoard._propagate(tiles, sums, trail, stats, [tile], strategy,
+                                                      budget):
+                            return False
+                        removed = True
+            return True
+        finally:
+            if stats is not None:
+                stats.probeTime += time.perf_counter() - start
+
+    @staticmethod
+    def _count(tiles, sums, trail, limit, component, changed = None):
+        """Count the solutions for the tiles of the component, up to limit,
+        leaving the state as it was. changed is given to _propagate."""
+
+        checkpoint = trail.checkpoint()
+        try:
+            if not KakuroBoard._propagate(tiles, sums, trail, None, changed):
+                return 0
+
+            undecided = [tile for tile in component if COUNT[tile.mask] > 1]
+            if not undecided:
+                return 1
+
+            components = KakuroBoard._components(undecided)
+            if len(components) > 1:
+                # The groups are independent, so the counts multiply. Each
+                # one is counted up to the limit: if any has no solution
+                # there is none, otherwise the capped product reaches the
+                # limit only if the real one does.
+                total = 1
+                for group in sorted(components, key = len):
+                    count = KakuroBoard._count(tiles, sums, trail, limit, group, [])
+                    if count == 0:
+                        return 0
+                    total *= count
+                return total if limit is None else min(total, limit)
+
+            tileID = KakuroBoard._branchingTile(undecided)
+            total = 0
+            for value in toValues(tiles[tileID].mask):
+                branch = trail.checkpoint()
+                tiles[tileID]._setValue(value, trail)
+                total += KakuroBoard._count(tiles, sums, trail,
+                                            None if limit is None else limit - total, undecided,
+                                            [tiles[tileID]])
+                trail.undo(branch)
+                if limit is not None and total >= limit:
+                    break
+            return total
+        finally:
+            trail.undo(checkpoint)
+
+    @staticmethod
+    def _components(tiles):
+        """Split the tiles in the connected components of the graph where two
+        tiles are linked if they are in the same sum."""
+
+        remaining = {tile._id: tile for tile in tiles}
+        components = []
+        while remaining:
+            _, tile = remaining.popitem()
+            component = [tile]
+            stack = [tile]
+            while stack:
+                for sum in stack.pop().sums:
+                    for other in sum.tileList:
+                        if other._id in remaining:
+                            del remaining[other._id]
+                            component.append(other)
+                            stack.append(other)
+            components.append(component)
+        return components
+
+    @staticmethod
+    def _branchingTile(tiles):
+        """Return the id of the tile to branch on: the one with the fewest
+        possible values, but more than one."""
+
+        # Pick the tile with the fewest choices to minimize branching.
+        return MinRemainingValues().selectTile(tiles)._id
 
     @staticmethod
     def _mycopy(tiles, sums):
@@ -160,17 +748,57 @@ class KakuroBoard:
 
     @staticmethod
     def _parse(filename):
+        """Read a board from a CSV file, where every item is a tile: '#' is a
+        brick, '' a blank, a digit a blank with that value given and 'v-h' a
+        brick with vertical sum v and horizontal sum h (any of them can be
+        missing)."""
+
+        import csv
+        with open(filename, encoding="utf8") as csv_file:
+            return KakuroBoard._parseRows(csv.reader(csv_file, delimiter=','))
+
+    @staticmethod
+    def _parseText(text):
+        """Same as _parse, but read the board from the content of the file."""
+
+        import csv
+        return KakuroBoard._parseRows(csv.reader(text.splitlines(), delimiter=','))
+
+    @staticmethod
+    def _toText(board):
+        """Return the content of the CSV file for the board, the inverse of
+        _parseText."""
+
+        def format_tile(tile):
+            if isinstance(tile, Brick):
+                if not (tile.verticalSum or tile.horizontalSum):
+                    return "#"
+                return "%s-%s" % (tile.verticalSum or "", tile.horizontalSum or "")
+            if COUNT[tile.mask] == 1:
+                return str(MIN[tile.mask])
+            return ""
+
+        return "".join(",".join(format_tile(tile) for tile in row) + "\n" for row in board)
+
+    @staticmethod
+    def _parseRows(rows):
+
+        # Bricks are never changed, so all the walls can be the same one.
+        wall = Brick()
 
         def parse_row(row):
             parsed_row = []
             for item in row:
 
                 if item == "#":
-                    parsed_row.append(Brick())
+                    parsed_row.append(wall)
 
                 elif item == "":
                     parsed_row.append(Blank())
 
+                elif item.isdigit():
+                    parsed_row.append(Blank(int(item)))
+
                 else:
                     item = item.split("-")
 
@@ -189,17 +817,12 @@ class KakuroBoard:
 
             return parsed_row
 
-        import csv
-        with open(filename, encoding="utf8") as csv_file:
-            csv_reader = csv.reader(csv_file, delimiter=',')
-
-            board = []
+        board = []
 
-            for row in csv_reader:
-                board.append(parse_row(row))
+        for row in rows:
+            board.append(parse_row(row))
 
         return board
-        
 
 
 if __name__ == '__main__':
@@ -261,7 +884,8 @@ if __name__ == '__main__':
     #     [Brick(h=7), Blank(), Blank(), Blank()],
     # ]
 
-    kakuro_board = KakuroBoard("Kakuro.txt")
+    import sys
+    kakuro_board = KakuroBoard(sys.argv[1] if len(sys.argv) > 1 else "Kakuro.txt")
     # kakuro_board = KakuroBoard(board)
     print(kakuro_board)
 
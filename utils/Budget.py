@@ -0,0 +1,122 @@
+import time
+
+from utils.Domain import COUNT, toValues
+
+
+class BudgetExhausted(Exception):
+    """Raised by a Budget when one of its limits is passed. reason is
+    "deadline", "nodes" or "revisions"; KakuroBoard.solve sets result to the
+    SearchResult of the search up to there."""
+
+    def __init__(self, reason):
+        Exception.__init__(self, "%s budget exhausted" % reason)
+        self.reason = reason
+        self.result = None
+
+
+class Budget:
+    """The limits of a search: a deadline, in seconds from the creation of
+    the budget, a number of search nodes and a number of revisions of the GAC
+    queue, any of them None for no limit.
+
+    The search calls node() on every node and revision() on every revision,
+    which raise BudgetExhausted once a limit is passed, and check() in the
+    loops that do neither, which only looks at the deadline. They only count
+    and compare: the clock is read on every node, but only once every
+    CLOCK_EVERY revisions or checks."""
+
+    CLOCK_EVERY = 64
+
+    def __init__(self, deadline = None, maxNodes = None, maxRevisions = None):
+        self.deadline = deadline
+        self.maxNodes = maxNodes
+        self.maxRevisions = maxRevisions
+        self.nodes = 0
+        self.revisions = 0
+        # Domains of the tiles once the root of the search is propagated,
+        # set by the search.
+        self.rootMasks = None
+
+        self._start = time.perf_counter()
+        self._end = None if deadline is None else self._start + deadline
+        self._nextCheck = 0
+        self._setNextCheck()
+        self._checks = 0
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def _setNextCheck(self):
+        """Set the revision at which revision() has to look at the limits."""
+        nextCheck = float("inf") if self._end is None else self.revisions + Budget.CLOCK_EVERY
+        if self.maxRevisions is not None:
+            nextCheck = min(nextCheck, self.maxRevisions + 1)
+        self._nextCheck = nextCheck
+
+    def node(self):
+        """Count a node of the search."""
+        self.nodes += 1
+        if self.maxNodes is not None and self.nodes > self.maxNodes:
+            raise BudgetExhausted("nodes")
+        if self._end is not None and time.perf_counter() > self._end:
+            raise BudgetExhausted("deadline")
+
+    def check(self):
+        """Look at the deadline, in a loop that counts no node or revision."""
+        self._checks += 1
+        if self._end is not None and self._checks % Budget.CLOCK_EVERY == 0 \
+                and time.perf_counter() > self._end:
+            raise BudgetExhausted("deadline")
+
+    def revision(self):
+        """Count a revision of a sum."""
+        self.revisions += 1
+        if self.revisions >= self._nextCheck:
+            if self.maxRevisions is not None and self.revisions > self.maxRevisions:
+                raise BudgetExhausted("revisions")
+            if self._end is not None and time.perf_counter() > self._end:
+                raise BudgetExhausted("deadline")
+            self._setNextCheck()
+
+
+class SearchResult:
+    """The outcome of KakuroBoard.solveAnytime, or of a solve that ran out
+    of budget.
+
+    status is COMPLETE if every solution was found, UNSAT if there is none,
+    LIMIT if the search stopped at maxSolutions and BUDGET if a budget ran
+    out first, reason telling which one. solutions are the lists of tiles
+    found. masks are the domains of the tiles, by id, propagated at the root
+    of the search (or as far as the propagation went, if the budget ran out
+    during it): all the values removed there are wrong for every solution,
+    so they are hints also when the search did not finish."""
+
+    COMPLETE = "complete"
+    UNSAT = "unsat"
+    LIMIT = "limit"
+    BUDGET = "budget"
+
+    def __init__(self, status, solutions, masks, reason = None, nodes = 0, revisions = 0,
+                 time = 0.0):
+        self.status = status
+        self.solutions = solutions
+        self.masks = masks
+        self.reason = reason
+        self.nodes = nodes
+        self.revisions = revisions
+        self.time = time
+
+    @property
+    def domains(self):
+        """The propagated domains, as lists of values."""
+        return [toValues(mask) for mask in self.masks]
+
+    @property
+    def fixed(self):
+        """The number of tiles with a single value left in their domain."""
+        return sum(1 for mask in self.masks if COUNT[mask] == 1)
+
+    def __repr__(self):
+        return "SearchResult(status=%s, reason=%s, solutions=%d, fixed=%d/%d, nodes=%d, " \
+               "revisions=%d, time=%.3f)" % (self.status, self.reason, len(self.solutions),
+               self.fixed, len(self.masks), self.nodes, self.revisions, self.time)
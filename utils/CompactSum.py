@@ -0,0 +1,154 @@
+import heapq
+import itertools
+
+from utils.Domain import FULL, fromValues
+from utils.Sum import Sum
+
+# Columns of the global permutation table, by (value, length): a tuple with a
+# bytes object for every position, holding the digit of every permutation in
+# the same sorted order as getPermutations. They are built without the tuples
+# of the python table, so with this backend that table is never filled, and
+# are shared by every sum and never written.
+_columns = {}
+
+# _KEEP[mask] is the table for bytes.translate mapping the digits in the mask
+# to 1 and every other byte to 0, filled lazily.
+_KEEP = {}
+# Tables for bytes.translate taking a digit plus 16 back to the digit and
+# deleting the bytes below 16 (see CompactSum._filter).
+_UNSHIFT = bytes(b - 16 if 16 <= b < 32 else 0 for b in range(256))
+_DROP = bytes(range(16))
+
+def getColumns(value, length):
+    """Return the permutations of getPermutations as a tuple of columns, one
+    bytes object for every position."""
+
+    key = (value, length)
+    columns = _columns.get(key)
+    if columns is None:
+        # The permutations of every combination come in sorted order, so
+        # merging them gives the whole table sorted.
+        combinations = [combination
+                        for combination in itertools.combinations(range(1, 10), length)
+                        if sum(combination) == value]
+        flat = bytes(itertools.chain.from_iterable(
+            heapq.merge(*[itertools.permutations(combination) for combination in combinations])))
+        columns = tuple(flat[i::length] for i in range(length))
+        _columns[key] = columns
+    return columns
+
+def _keep(mask):
+    table = _KEEP.get(mask)
+    if table is None:
+        table = bytes(mask >> b & 1 if b < 10 else 0 for b in range(256))
+        _KEEP[mask] = table
+    return table
+
+
+class CompactSum(Sum):
+    """A Sum whose configurations are stored by column, as a bytes object for
+    every tile with one byte for each configuration still valid, instead of a
+    list of tuples: a configuration takes a byte per tile instead of a tuple
+    and a pointer to it.
+
+    The columns start as the shared columns of the global table. Filtering
+    by a tile's domain translates its column into a 0/1 flag for every
+    configuration and drops the configurations flagged 0 from every column,
+    the values supported by a tile are the set of the bytes of its column,
+    all without a python loop over the configurations. The masks of the
+    supported values are computed only when the columns change. Columns are
+    never changed in place, so copies and the trail can share them."""
+
+    __slots__ = ('columns', '_supports')
+
+    def __init__(self, value, tileList, isCopy=False):
+        Sum.__init__(self, value, tileList, isCopy=True)
+
+        if not(isCopy):
+            self._index = {tile._id: i for i, tile in enumerate(tileList)}
+            # Filter only on the tiles that have a given value or a reduced domain.
+            tests = [(idx, tile.mask) for idx, tile in enumerate(tileList) if tile.mask != FULL]
+            self.columns = CompactSum._filter(getColumns(value, len(tileList)), tests)
+            self._supports = CompactSum._computeSupports(self.columns)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    @property
+    def configurations(self):
+        """The valid configurations, as a list of tuples."""
+        return list(zip(*self.columns))
+
+    @staticmethod
+    def _filter(columns, tests):
+        """Return the columns keeping only the configurations whose value in
+        column idx is in the mask, for every (idx, mask) of the tests, the
+        same columns if they all are.
+
+        The flags of the configurations to keep are put together as big
+        ints, one byte each. Adding the flags times 16 to a column, again
+        as ints, gives 16 plus the digit for the configurations to keep and
+        the digit alone for the others, which translate then deletes."""
+
+        keep = None
+        for idx, mask in tests:
+            flags = int.from_bytes(columns[idx].translate(_keep(mask)), "big")
+            keep = flags if keep is None else keep & flags
+        if keep is None:
+            return columns
+        n = len(columns[0])
+        if 0 not in keep.to_bytes(n, "big"):
+            return columns
+        keep <<= 4
+        return tuple((int.from_bytes(column, "big") + keep).to_bytes(n, "big")
+                     .translate(_UNSHIFT, _DROP) for column in columns)
+
+    @staticmethod
+    def _computeSupports(columns):
+        """Return, for every column, the mask of the values in it."""
+        return [fromValues(set(column)) for column in columns]
+
+    def deepcopy(self, memo = None):
+        if memo == None:
+            copyTiles = [tile.deepcopy() for tile in self.tileList]
+        else:
+            copyTiles = [memo[tile._id] for tile in self.tileList]
+
+        copy = CompactSum(self.value, copyTiles, isCopy = True)
+        copy._id = self._id
+        copy._index = self._index
+        copy.columns = self.columns
+        copy._supports = self._supports
+        return copy
+
+    def getState(self):
+        return self.columns, self._supports
+
+    def setState(self, state):
+        self.columns, self._supports = state
+
+    def filterConfigFromTile(self, tile, trail = None):
+        return self.filterConfigFromTiles((tile,), trail)
+
+    def filterConfigFromTiles(self, tiles, trail = None):
+        columns = CompactSum._filter(self.columns,
+                                     [(self._index[tile._id], tile.mask) for tile in tiles])
+
+        changed = columns is not self.columns
+        if changed:
+            if trail is not None:
+                trail.record(self, 'columns', self.columns)
+                trail.record(self, '_supports', self._supports)
+            self.columns = columns
+            self._supports = CompactSum._computeSupports(columns)
+
+        return changed
+
+    def getMasks(self):
+        return self._supports
+
+    def getValuesForTile(self, tile):
+        return list(self.columns[self._index[tile._id]])
+
+    def getMaskForTile(self, tile):
+        return self._supports[self._index[tile._id]]
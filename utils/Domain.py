@@ -0,0 +1,42 @@
+"""Bitset representation of the domain of a Blank tile.
+
+A domain is stored as a plain int where bit v is set when the digit v (1..9)
+is still a possible value for the tile, so bit 0 is never used and a full
+domain is 0b1111111110. Intersection is a single '&', while popcount, min, max
+and the list of values are read from tables precomputed for all the 1024
+possible masks."""
+
+FULL = 0b1111111110
+
+# BIT[v] is the mask containing only the digit v.
+BIT = [1 << v for v in range(10)]
+
+# Tables indexed by mask.
+VALUES = [tuple(v for v in range(1, 10) if mask >> v & 1) for mask in range(1 << 10)]
+COUNT = [len(values) for values in VALUES]
+MIN = [values[0] if values else None for values in VALUES]
+MAX = [values[-1] if values else None for values in VALUES]
+
+
+def fromValues(values):
+    """Return the mask containing all the given digits."""
+    mask = 0
+    for value in values:
+        mask |= BIT[value]
+    return mask
+
+def toValues(mask):
+    """Return the digits contained in the mask as a new sorted list."""
+    return list(VALUES[mask])
+
+def popcount(mask):
+    """Return the number of digits in the mask."""
+    return COUNT[mask]
+
+def minValue(mask):
+    """Return the smallest digit in the mask, None if it is empty."""
+    return MIN[mask]
+
+def maxValue(mask):
+    """Return the biggest digit in the mask, None if it is empty."""
+    return MAX[mask]
@@ -0,0 +1,122 @@
+from utils.Domain import COUNT, toValues
+
+class Strategy:
+    """A branching strategy tells the search what to try at every node where
+    the propagation left undecided tiles.
+
+    branches(tiles, sums) returns the branches to try in order, each a list
+    of (tile, value) assignments; the branches must split the solutions of
+    the node among them. onFailure(sum) is called when the revision of sum
+    wiped out a domain, for the strategies learning from conflicts.
+
+    The strategies branching on a tile pick it with selectTile, in a single
+    pass over the tiles, and try its values in ascending order or, with
+    leastConstraining, from the one leaving more configurations to its sums
+    (least-constraining value ordering)."""
+
+    def __init__(self, leastConstraining = False):
+        self.leastConstraining = leastConstraining
+
+    def branches(self, tiles, sums):
+        tile = self.selectTile(tiles)
+        return [[(tile, value)] for value in self.orderValues(tile)]
+
+    def selectTile(self, tiles):
+        raise NotImplementedError
+
+    def orderValues(self, tile):
+        values = toValues(tile.mask)
+        if not self.leastConstraining:
+            return values
+
+        # The support of a value is the product, over the sums of the tile,
+        # of the configurations where the tile has that value.
+        support = dict.fromkeys(values, 1)
+        for sum in tile.sums:
+            counts = dict.fromkeys(values, 0)
+            for value in sum.getValuesForTile(tile):
+                counts[value] += 1
+            for value in values:
+                support[value] *= counts[value]
+        return sorted(values, key = lambda value: -support[value])
+
+    def onFailure(self, sum):
+        pass
+
+
+class MinRemainingValues(Strategy):
+    """Branch on the tile with the fewest possible values, ties broken by
+    id. This is the default strategy."""
+
+    def selectTile(self, tiles):
+        best, bestKey = None, None
+        for tile in tiles:
+            count = COUNT[tile.mask]
+            if count > 1 and (bestKey is None or (count, tile._id) < bestKey):
+                best, bestKey = tile, (count, tile._id)
+        return best
+
+
+class LeastConstrainingValue(MinRemainingValues):
+    """MinRemainingValues with least-constraining value ordering."""
+
+    def __init__(self):
+        MinRemainingValues.__init__(self, leastConstraining = True)
+
+
+class DomWdeg(Strategy):
+    """Conflict-weighted branching (dom/wdeg): every sum has a weight, one
+    more for every time its revision wiped out a domain, and the tile chosen
+    is the one with the smallest ratio between its number of values and the
+    weights of its sums. The weights are kept by sum id, so they survive the
+    copies of the board."""
+
+    def __init__(self, leastConstraining = False):
+        Strategy.__init__(self, leastConstraining)
+        self.weights = {}
+
+    def onFailure(self, sum):
+        self.weights[sum._id] = self.weights.get(sum._id, 1) + 1
+
+    def selectTile(self, tiles):
+        weights = self.weights
+        best, bestKey = None, None
+        for tile in tiles:
+            count = COUNT[tile.mask]
+            if count > 1:
+                weight = 0
+                for sum in tile.sums:
+                    weight += weights.get(sum._id, 1)
+                # A tile in no sum has no weight: count it as one sum.
+                key = (count / (weight or 1), tile._id)
+                if bestKey is None or key < bestKey:
+                    best, bestKey = tile, key
+        return best
+
+
+class SumBranching(Strategy):
+    """Branch on the sum with the fewest configurations left (but more than
+    one), trying each of its configurations as a whole: a branch assigns all
+    its undecided tiles at once. The undecided tiles in no such sum, i.e. in
+    no sum at all, are branched on like MinRemainingValues."""
+
+    def branches(self, tiles, sums):
+        best = None
+        for sum in sums:
+            size = len(sum)
+            if size > 1 and (best is None or size < len(best)):
+                best = sum
+        if best is None:
+            return MinRemainingValues().branches(tiles, sums)
+
+        undecided = [(i, tile) for i, tile in enumerate(best.tileList) if COUNT[tile.mask] > 1]
+        return [[(tile, config[i]) for i, tile in undecided] for config in best.configurations]
+
+
+# Built-in strategies by name.
+STRATEGIES = {
+    "mrv": MinRemainingValues,
+    "lcv": LeastConstrainingValue,
+    "domwdeg": DomWdeg,
+    "sum": SumBranching,
+}
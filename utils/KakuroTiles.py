@@ -1,21 +1,25 @@
-from functools import reduce
+from utils import Domain
 
 class KakuroTile:
     """The superclass for entries in a Kakuro board."""
-    pass
+    # No instance dictionary: a big board has tens of thousands of tiles.
+    __slots__ = ()
 
 
 class Blank(KakuroTile):
     """A blank square to be filled in."""
+    __slots__ = ('mask', '_id', 'sums')
     id = 0
 
     def __init__(self, value = None, specificId = None):
+        # The domain is kept as a bitmask (see utils.Domain), possibleValues
+        # is only a list view of it.
         if value == None:
-            self.possibleValues = [*range(1,10)]
+            self.mask = Domain.FULL
         elif isinstance(value, list):
-            self.possibleValues = value
+            self.mask = Domain.fromValues(value)
         else:
-            self.possibleValues = [value]
+            self.mask = Domain.BIT[value]
 
         # Give every blank an index for easy identification and to determine
         # if one blank is a copy of another.
@@ -32,19 +36,30 @@ class Blank(KakuroTile):
         """Return a string identifying this blank and possibile value."""
         return 'T%2s->%s' % (self._id, str(self.possibleValues))
 
+    @property
+    def possibleValues(self):
+        """The list of values still possible for this blank."""
+        return Domain.toValues(self.mask)
+
+    @possibleValues.setter
+    def possibleValues(self, values):
+        self.mask = Domain.fromValues(values)
+
     def __repr__(self):
         "     "
         "  @1 "
         """Standard output called from print function. Return srt(value) in 3 char"""
-        if len(self.possibleValues) != 1: return "  @"+str(len(self.possibleValues))+" "
-        return "  "+str(self.possibleValues[0])+"  "
+        if Domain.COUNT[self.mask] != 1: return "  @"+str(Domain.COUNT[self.mask])+" "
+        return "  "+str(Domain.MIN[self.mask])+"  "
 
-    def _setValue(self, value):
+    def _setValue(self, value, trail = None):
         """Set the value for this entry. This triggers a reaction where we
         modify the configuration's sums containing this entry and modify them
-        accordingly."""
-        if value in self.possibleValues:
-            self.possibleValues = [value]
+        accordingly. If a trail is given the old domain is recorded on it."""
+        if self.mask & Domain.BIT[value]:
+            if trail is not None:
+                trail.record(self, 'mask', self.mask)
+            self.mask = Domain.BIT[value]
         else:
             raise ValueError("Not valid value")
 
@@ -65,27 +80,33 @@ class Blank(KakuroTile):
 
         return changed# Report if anything changed.
 
-    def filterValuesFromSums(self):
+    def filterValuesFromSums(self, trail = None):
         """This entry can only have certain values in each sum it appears in.
         The possible values that it can have overall is the intersection of
         its current possible values with the possible values in each of the
-        sums in which it appears."""
-        
-        newPossibleValues = list(reduce(lambda x,y: x.intersection(y),
-                                [set(sum.getValuesForTile(self)) for sum in self.sums],
-                                set(self.possibleValues)))
-        changed = (newPossibleValues != self.possibleValues)
-        self.possibleValues = newPossibleValues
+        sums in which it appears. If a trail is given the change is recorded
+        on it."""
+
+        newMask = self.mask
+        for sum in self.sums:
+            newMask &= sum.getMaskForTile(self)
+        changed = (newMask != self.mask)
+        if changed:
+            if trail is not None:
+                trail.record(self, 'mask', self.mask)
+            self.mask = newMask
 
         return changed # Report if anything changed.
 
     def deepcopy(self):
-        copy = Blank(value = self.possibleValues[:], specificId = self._id)
+        copy = Blank(specificId = self._id)
+        copy.mask = self.mask
         #Sum is not copied because will registered during copy of sum
         return copy
 
 class Brick(KakuroTile):
     """A brick, not editable, i.e. solid space."""
+    __slots__ = ('verticalSum', 'horizontalSum')
 
     def __init__(self, v=None, h=None):
         self.verticalSum = v
@@ -0,0 +1,128 @@
+import numpy as np
+
+from utils.Domain import FULL
+from utils.Sum import Sum, getPermutations
+
+# Arrays of the global permutation table, by (value, length). They are shared
+# by every sum and never written.
+_arrays = {}
+
+# _IN_MASK[mask, v] is True if the digit v is in the domain mask.
+_IN_MASK = ((np.arange(1 << 10)[:, None] >> np.arange(10)) & 1).astype(bool)
+# _BIT[v] is the domain mask of the digit v.
+_BIT = (1 << np.arange(10)).astype(np.uint16)
+
+def getArray(value, length):
+    """Return the permutations of getPermutations as a read-only uint8 array
+    with a row for each permutation."""
+
+    key = (value, length)
+    array = _arrays.get(key)
+    if array is None:
+        permutations = getPermutations(value, length)
+        array = np.array(permutations, dtype=np.uint8).reshape(len(permutations), length)
+        array.flags.writeable = False
+        _arrays[key] = array
+    return array
+
+
+class NumpySum(Sum):
+    """A Sum whose configurations are stored as a uint8 array with a row for
+    each configuration still valid. Filtering by a tile's domain is a boolean
+    mask on a column of the array, computing the values supported for a tile
+    a reduction of the column.
+
+    The rows start as a view of the shared array of the global table and on
+    every filtering the live rows are compacted in a new array, so the cost of
+    each operation follows the number of valid configurations. The masks of
+    the values supported by every column are computed together, in a single
+    reduction, only when the rows change. The array is never changed in
+    place, so copies and the trail can share it."""
+    __slots__ = ('rows', '_supports')
+
+    def __init__(self, value, tileList, isCopy=False):
+        Sum.__init__(self, value, tileList, isCopy=True)
+
+        if not(isCopy):
+            self._index = {tile._id: i for i, tile in enumerate(tileList)}
+            rows = getArray(value, len(tileList))
+            # Filter only on the tiles that have a given value or a reduced domain.
+            for idx, tile in enumerate(tileList):
+                if tile.mask != FULL:
+                    rows = rows[_IN_MASK[tile.mask][rows[:, idx]]]
+            self.rows = rows
+            self._supports = NumpySum._computeSupports(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def configurations(self):
+        """The valid configurations, as a list of tuples."""
+        return [tuple(config) for config in self.rows.tolist()]
+
+    @staticmethod
+    def _computeSupports(rows):
+        """Return, for every column of rows, the mask of the values in it."""
+        return np.bitwise_or.reduce(_BIT[rows], axis=0).tolist()
+
+    def deepcopy(self, memo = None):
+        if memo == None:
+            copyTiles = [tile.deepcopy() for tile in self.tileList]
+        else:
+            copyTiles = [memo[tile._id] for tile in self.tileList]
+
+        copy = NumpySum(self.value, copyTiles, isCopy = True)
+        copy._id = self._id
+        copy._index = self._index
+        copy.rows = self.rows
+        copy._supports = self._supports
+        return copy
+
+    def getState(self):
+        return self.rows, self._supports
+
+    def setState(self, state):
+        self.rows, self._supports = state
+
+    def filterConfigFromTile(self, tile, trail = None):
+        idx = self._index[tile._id]
+
+        # Keep only the rows whose value in the column is in the domain.
+        keep = _IN_MASK[tile.mask][self.rows[:, idx]]
+        changed = not keep.all()
+        if changed:
+            if trail is not None:
+                trail.record(self, 'rows', self.rows)
+                trail.record(self, '_supports', self._supports)
+            self.rows = self.rows[keep]
+            self._supports = NumpySum._computeSupports(self.rows)
+
+        return changed
+
+    def filterConfigFromTiles(self, tiles, trail = None):
+        keep = None
+        for tile in tiles:
+            column = _IN_MASK[tile.mask][self.rows[:, self._index[tile._id]]]
+            keep = column if keep is None else keep & column
+
+        changed = keep is not None and not keep.all()
+        if changed:
+            if trail is not None:
+                trail.record(self, 'rows', self.rows)
+                trail.record(self, '_supports', self._supports)
+            self.rows = self.rows[keep]
+            self._supports = NumpySum._computeSupports(self.rows)
+
+        return changed
+
+    def getMasks(self):
+        return self._supports
+
+    def getValuesForTile(self, tile):
+        i = self._index[tile._id]
+        return self.rows[:, i].tolist()
+
+    def getMaskForTile(self, tile):
+        i = self._index[tile._id]
+        return self._supports[i]
@@ -0,0 +1,59 @@
+import array
+
+class ProbeCache:
+    """Settings and memory of the probing done by KakuroBoard._probe
+    (singleton arc consistency): a value of a tile is probed by giving it to
+    the tile and propagating, and is removed if that wipes out a domain.
+
+    When a probe succeeds, the domains it ends with are kept as a witness of
+    the value: as long as every current domain still contains the one of the
+    witness, propagating the value would succeed again, so the probe is
+    skipped. Witnesses hold for any state, so one cache serves the whole
+    search. A witness holds the masks by tile id, 0 for the tiles it does
+    not cover, and supports a probe only if it covers every tile the probe
+    can read.
+
+    budget is the number of probes done by each call of _probe, None for no
+    limit, everyNode tells the search to probe at every node and not only at
+    the root, and maxWitnesses is the number of witnesses kept, the oldest
+    are dropped first."""
+
+    def __init__(self, budget = None, everyNode = False, maxWitnesses = 10000):
+        self.budget = budget
+        self.everyNode = everyNode
+        self.maxWitnesses = maxWitnesses
+        self._witnesses = {}
+
+    def __len__(self):
+        return len(self._witnesses)
+
+    def isSupported(self, tile, value, tiles):
+        """Return True if the witness of value for tile, if any, covers all
+        the tiles and is contained in their current masks."""
+
+        witness = self._witnesses.get((tile._id, value))
+        if witness is None:
+            return False
+        size = len(witness)
+        for other in tiles:
+            tileID = other._id
+            if tileID >= size:
+                return False
+            witnessMask = witness[tileID]
+            if not witnessMask or witnessMask & ~other.mask:
+                return False
+        return True
+
+    def store(self, tile, value, tiles):
+        """Keep the current masks of the tiles as the witness of value for
+        tile."""
+
+        witnesses = self._witnesses
+        key = (tile._id, value)
+        witnesses.pop(key, None)
+        if witnesses and len(witnesses) >= self.maxWitnesses:
+            del witnesses[next(iter(witnesses))]
+        witness = array.array('H', bytes(2 * (max(other._id for other in tiles) + 1)))
+        for other in tiles:
+            witness[other._id] = other.mask
+        witnesses[key] = witness
@@ -0,0 +1,130 @@
+import collections
+import hashlib
+import json
+import sqlite3
+
+from utils.Domain import FULL
+from utils.KakuroTiles import Blank
+
+
+def fingerprint(board):
+    """Return the fingerprint of a board, given as rows of Brick and Blank,
+    and the ids of its blanks (their index in reading order, as numbered by
+    KakuroBoard) in the order of the fingerprint.
+
+    The fingerprint is the same for the board and its transpose, where rows
+    and columns are swapped and so are the vertical and horizontal sums: it
+    is the hash of the smaller of the two descriptions, cell by cell, and
+    the blanks are ordered by reading the board in that orientation."""
+
+    size = max(len(board), max((len(row) for row in board), default = 0))
+    ids = {}
+    for x, row in enumerate(board):
+        for y, tile in enumerate(row):
+            if isinstance(tile, Blank):
+                ids[(x, y)] = len(ids)
+
+    def describe(transposed):
+        cells, order = [], []
+        for i in range(size):
+            for j in range(size):
+                x, y = (j, i) if transposed else (i, j)
+                tile = board[x][y] if x < len(board) and y < len(board[x]) else None
+                if isinstance(tile, Blank):
+                    cells.append("" if tile.mask == FULL else str(tile.mask))
+                    order.append(ids[(x, y)])
+                elif tile is None:
+                    cells.append("#")
+                else:
+                    v, h = tile.verticalSum or "", tile.horizontalSum or ""
+                    cells.append("%s-%s" % ((h, v) if transposed else (v, h)))
+        return ",".join(cells), order
+
+    description, order = min(describe(False), describe(True))
+    return hashlib.sha256(("%d:%s" % (size, description)).encode()).hexdigest(), order
+
+
+class SolutionCache:
+    """Solutions of the boards by fingerprint, as lists of the values of the
+    blanks in the order of the fingerprint, with whether they are all the
+    solutions of the board or only the first ones found.
+
+    The last maxSize boards used are kept in memory. If a path is given the
+    solutions are also stored in a sqlite database there, which can be
+    shared by many processes."""
+
+    def __init__(self, path = None, maxSize = 1024):
+        self.maxSize = maxSize
+        self._memory = collections.OrderedDict()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout = 30)
+            self._db.execute("CREATE TABLE IF NOT EXISTS solutions "
+                             "(key TEXT PRIMARY KEY, complete INTEGER, solutions TEXT)")
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._memory)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxSize:
+            self._memory.popitem(last = False)
+
+    def get(self, key):
+        """Return (solutions, complete) for the fingerprint, None if the
+        board is not in the cache."""
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            return entry
+        if self._db is not None:
+            row = self._db.execute("SELECT solutions, complete FROM solutions WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is not None:
+                entry = (json.loads(row[0]), bool(row[1]))
+                self._remember(key, entry)
+                return entry
+        return None
+
+    def solutions(self, board, minSolutions = None):
+        """Return the lists of tiles of the solutions of the board, given as
+        rows of Brick and Blank, None if the cache does not have all of them
+        or, if given, at least minSolutions."""
+
+        key, order = fingerprint(board)
+        entry = self.get(key)
+        if entry is None:
+            return None
+        values, complete = entry
+        if not complete and (minSolutions is None or len(values) < minSolutions):
+            return None
+
+        solutions = []
+        for solution in values:
+            tiles = [None] * len(order)
+            for tileID, value in zip(order, solution):
+                tiles[tileID] = Blank(value, specificId = tileID)
+            solutions.append(tiles)
+        return solutions
+
+    def put(self, key, solutions, complete):
+        """Store the solutions found for the fingerprint, unless the cache
+        already knows more of them."""
+
+        old = self.get(key)
+        if old is not None and (old[1] or (not complete and len(old[0]) >= len(solutions))):
+            return
+        entry = (solutions, complete)
+        self._remember(key, entry)
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)",
+                             (key, int(complete), json.dumps(solutions)))
+            self._db.commit()
@@ -0,0 +1,42 @@
+class Stats:
+    """Counters of the work done by a search, filled by KakuroBoard.solve
+    when given one, and hooks called on its events. Without a Stats object
+    the solver only pays for a check against None.
+
+    onBranch(tileId, value, depth) is called before trying a value on the
+    branching tile, onSolution(tiles, depth) for every solution found."""
+
+    def __init__(self, onBranch = None, onSolution = None):
+        # Revisions of a sum in the GAC queue.
+        self.revisions = 0
+        # Reductions of the domain of a tile.
+        self.domainReductions = 0
+        # Configurations of the sums removed by the filtering.
+        self.prunedConfigurations = 0
+        # Nodes of the search tree, i.e. calls of _solve.
+        self.nodes = 0
+        # Nodes that failed, whose branch had to be abandoned.
+        self.backtracks = 0
+        # Deepest node reached, the root is at depth 0.
+        self.maxDepth = 0
+        self.solutions = 0
+        # Values probed by singleton arc consistency, probes skipped thanks
+        # to a witness and values removed by the probes.
+        self.probes = 0
+        self.probeHits = 0
+        self.probeRemovals = 0
+        # Seconds spent in each phase.
+        self.nodeConsistencyTime = 0.0
+        self.gacTime = 0.0
+        self.branchingTime = 0.0
+        self.probeTime = 0.0
+
+        self.onBranch = onBranch
+        self.onSolution = onSolution
+
+    def asDict(self):
+        """Return the counters, without the hooks."""
+        return {name: value for name, value in vars(self).items() if not name.startswith("on")}
+
+    def __repr__(self):
+        return "Stats(%s)" % ", ".join("%s=%s" % item for item in self.asDict().items())
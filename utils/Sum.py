@@ -1,16 +1,61 @@
-from functools import reduce
+import itertools
+import pickle
+from utils.Domain import BIT, FULL, fromValues
+
+# Global table of the configurations of every sum, i.e. all the permutations of
+# distinct digits 1..9 of a given length adding up to a given value. It is
+# indexed by (value, length) and filled lazily, since there are only a few
+# hundred keys and the same ones are shared by every board.
+_table = {}
+
+def getPermutations(value, length):
+    """Return, as a sorted tuple of tuples, all the permutations of length
+    distinct digits whose sum is value."""
+
+    key = (value, length)
+    permutations = _table.get(key)
+    if permutations is None:
+        permutations = tuple(sorted(permutation
+                        for combination in itertools.combinations(range(1, 10), length)
+                        if sum(combination) == value
+                        for permutation in itertools.permutations(combination)))
+        _table[key] = permutations
+    return permutations
+
+def buildTable():
+    """Fill the table with every (value, length) pair."""
+    for length in range(1, 10):
+        for value in range(length * (length + 1) // 2, (19 - length) * length // 2 + 1):
+            getPermutations(value, length)
+
+def saveTable(filename):
+    """Freeze the table, as computed so far, to disk."""
+    with open(filename, "wb") as table_file:
+        pickle.dump(_table, table_file, pickle.HIGHEST_PROTOCOL)
+
+def loadTable(filename):
+    """Load a table frozen with saveTable, merging it with the current one."""
+    with open(filename, "rb") as table_file:
+        _table.update(pickle.load(table_file))
+
 
 class Sum:
     """Represents a sum in the board, i.e. the value of the sum and the iist of
     Blank objects contributing to that sum."""
+    __slots__ = ('value', 'tileList', '_id', '_index', 'configurations', '_isComplete')
 
     def __init__(self, value, tileList, isCopy=False):
         self.value = value
         self.tileList = tileList
+        # Index of the sum in its board, set by KakuroBoard and kept by the
+        # copies.
+        self._id = None
 
         # If this is not a copying operation, we calculate all possible assignments.
         if not(isCopy):
-            self.configurations = list(Sum._findConfiguration(self.value, self.tileList))
+            # Position of each tile in the configurations, by tile id.
+            self._index = {tile._id: i for i, tile in enumerate(tileList)}
+            self.configurations = Sum._findConfiguration(self.value, self.tileList)
 
         # Record each entry as appearing in this sum.
         for tile in tileList:
@@ -19,6 +64,10 @@ class Sum:
         #indicating that the sum is not yet fully determined.
         self._isComplete = False
 
+    def __len__(self):
+        """Return the number of configurations still valid for this sum."""
+        return len(self.configurations)
+
     def __str__(self):
         res = str(self.value) + " -> " + str([str(tile) for tile in self.tileList])
         for conf in self.configurations:
@@ -26,34 +75,21 @@ class Sum:
         return res
     
     @staticmethod
-    def _findConfiguration(value, tileList, exclude = []):
-        """_findConfiguration(value, tileList, exclude=[])
-
-        Given a value that will be excluded, find all possible assignments of values
-        to entries that satisfies this value. Exclude can be used to exclude certain
-        possible values. In this case, it is used recursively to make sure that each
-        possible number appears at most once in each sum."""
-
-        if value == 0 and len(tileList) == 0:
-            yield []# If we have a full sum, yield it.
-
-        if len(tileList) == 0:
-            return# If we are out of tiles to fill, we failed.
-
-        valid_tileList = [list(filter(lambda x: x not in exclude, tile.possibleValues)) for tile in tileList]
-        if not reduce(lambda x,y: x and y, valid_tileList , True):
-            return # If we have no possible value left for any remaining position, we failed.
-
-        if sum([max(valid_tile) for valid_tile in valid_tileList]) < value:
-            return # If we cannot even use the biggest guys to complete, stop.
-
-        if sum([min(valid_tile) for valid_tile in valid_tileList]) > value:
-            return# If we cannot even use the smallest guys to complete, stop.
-
-        # Otherwise, try to fill in the next position and reiterate.
-        for candidate in valid_tileList[0]:
-            for s in Sum._findConfiguration(value - candidate, tileList[1:], exclude + [candidate]):
-                yield [candidate] + s
+    def _findConfiguration(value, tileList):
+        """Find all possible assignments of values to the tiles that satisfies
+        this value, i.e. the permutations in the global table compatible with
+        the values already given to the tiles.
+
+        The result is a shared sequence of tuples that must never be modified
+        in place: filtering it always builds a new one."""
+
+        configurations = getPermutations(value, len(tileList))
+        # Filter only on the tiles that have a given value or a reduced domain.
+        for idx, tile in enumerate(tileList):
+            mask = tile.mask
+            if mask != FULL:
+                configurations = [config for config in configurations if mask >> config[idx] & 1]
+        return configurations
 
     def deepcopy(self, memo = None):
         copyTiles = memo
@@ -63,9 +99,29 @@ class Sum:
             copyTiles = [memo[tile._id] for tile in self.tileList]
 
         copy = Sum(self.value, copyTiles, isCopy = True)
+        copy._id = self._id
+        copy._index = self._index
         copy.configurations = self.configurations[:]
         return copy
 
+    def getState(self):
+        """Return the configurations still valid, in a form that can be sent
+        to another process and given back to setState."""
+        return self.configurations
+
+    def setState(self, state):
+        """Restore the configurations returned by getState."""
+        self.configurations = state
+
+    # Pickling goes through getState and setState, since the backends store
+    # the configurations in their own slots.
+    def __getstate__(self):
+        return self.value, self.tileList, self._id, self._index, self._isComplete, self.getState()
+
+    def __setstate__(self, state):
+        self.value, self.tileList, self._id, self._index, self._isComplete, state = state
+        self.setState(state)
+
     @DeprecationWarning
     def isComplete(self):
         """Return True if this sum is completely defined and has been processed.
@@ -81,26 +137,66 @@ class Sum:
 
         return self._isComplete
 
-    def filterConfigFromTile(self, tile):
+    def filterConfigFromTile(self, tile, trail = None):
         """For a given tile, filter out all configurations that are not valid
-        based on the possible values for the entry."""
+        based on the possible values for the entry. If a trail is given the
+        change is recorded on it."""
 
 
-        idx = self.tileList.index(tile)# Get the index in configurations for tile.
+        idx = self._index[tile._id]# Get the index in configurations for tile.
 
         # Filter, allowing only possible entries for entry.
-        newConfigurations = list(filter(lambda x: x[idx] in tile.possibleValues, self.configurations))
-        changed = (newConfigurations != self.configurations)
-        self.configurations = newConfigurations
+        mask = tile.mask
+        newConfigurations = [config for config in self.configurations if mask >> config[idx] & 1]
+        # Configurations are only ever removed, so the length tells if it changed.
+        changed = (len(newConfigurations) != len(self.configurations))
+        if changed:
+            if trail is not None:
+                trail.record(self, 'configurations', self.configurations)
+            self.configurations = newConfigurations
 
         # Report if anything changed.
         return changed
 
+    def filterConfigFromTiles(self, tiles, trail = None):
+        """Same as filterConfigFromTile, for all the given tiles at once."""
+
+        configurations = self.configurations
+        for tile in tiles:
+            idx = self._index[tile._id]
+            mask = tile.mask
+            configurations = [config for config in configurations if mask >> config[idx] & 1]
+
+        changed = (len(configurations) != len(self.configurations))
+        if changed:
+            if trail is not None:
+                trail.record(self, 'configurations', self.configurations)
+            self.configurations = configurations
+
+        return changed
+
+    def getMasks(self):
+        """Return, for every tile of the sum in order, the mask of the values
+        it can have in the configurations."""
+
+        if len(self.configurations) == 0:
+            return [0] * len(self.tileList)
+        return [fromValues(set(column)) for column in zip(*self.configurations)]
+
     def getValuesForTile(self, tile):
         """Given an tile appearing in the sum, determine all the possible values it can
             have in the sum."""
 
         # Get the index in the configurations for the tile.
-        i = self.tileList.index(tile)
+        i = self._index[tile._id]
         # Find all possible values for tile over the configurations.
-        return [config[i] for config in self.configurations]
\ No newline at end of file
+        return [config[i] for config in self.configurations]
+
+    def getMaskForTile(self, tile):
+        """Same as getValuesForTile, but return the values as a domain mask."""
+
+        i = self._index[tile._id]
+        mask = 0
+        for value in {config[i] for config in self.configurations}:
+            mask |= BIT[value]
+        return mask
@@ -0,0 +1,28 @@
+class Trail:
+    """The trail records every change made in place to the tiles and the sums
+    during the search, i.e. the object, the attribute changed and its old
+    value, so that on backtrack the state can be restored back to a
+    checkpoint instead of copying the whole board for every branch."""
+    __slots__ = ('_changes',)
+
+    def __init__(self):
+        self._changes = []
+
+    def __len__(self):
+        return len(self._changes)
+
+    def record(self, obj, attr, oldValue):
+        """Record that attr of obj is going to be changed from oldValue."""
+        self._changes.append((obj, attr, oldValue))
+
+    def checkpoint(self):
+        """Return a checkpoint for the current state, to be used with undo."""
+        return len(self._changes)
+
+    def undo(self, checkpoint):
+        """Restore all the changes made after the checkpoint, the most recent
+        first."""
+        changes = self._changes
+        while len(changes) > checkpoint:
+            obj, attr, oldValue = changes.pop()
+            setattr(obj, attr, oldValue)